@@ -1,9 +1,9 @@
 import os
+import sys
 
-# 顺序执行
-os.system("python ./py/crawler.py")
-os.system("python ./py/sse_csv.py")
-os.system("python ./py/szse_csv.py")
-os.system("python ./py/draw300.py")
-os.system("python ./py/draw1000.py")
-os.system("python ./py/mad.py")
\ No newline at end of file
+# 流水线：抓取 → 列式存储 → 分组汇总 → 检测 → 绘图（按依赖关系调度，未变化的阶段跳过）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "py"))
+
+from pipeline import run_pipeline
+
+run_pipeline()
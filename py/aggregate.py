@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+import sys
+import numpy as np
+from columnar_store import load_bars
+from index_groups import load_config, load_group_totals
+
+# 汇总文件表头
+HEADER = ["交易日期", "总成交额(万元)"]
+
+# 汇总进度：每只ETF已汇总到的最后日期及当时的行数，以及各分组的成分
+STATE_FILE = "aggregate_state.json"
+
+
+def load_state(filename=STATE_FILE):
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"codes": {}, "groups": {}}
+
+
+def save_state(state, filename=STATE_FILE):
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, filename)
+
+
+def _format_rows(dates, total):
+    return [[str(date), f"{value:.2f}"] for date, value in zip(dates, total) if value == value]
+
+
+def write_group(filename, dates, total):
+    """
+    原子重写一个分组的汇总文件，跳过所有成分都无数据的日期
+    """
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(_format_rows(dates, total))
+    os.replace(tmp, filename)
+
+
+def upsert_group(filename, dates, total, last_date):
+    """
+    只写入受影响的日期：全部晚于文件最后日期时直接追加，否则按日期替换后原子重写
+    """
+    rows = _format_rows(dates, total)
+    if not rows:
+        return
+    if last_date is not None and os.path.exists(filename) and int(dates[0]) > last_date:
+        with open(filename, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+        return
+
+    existing = {}
+    if os.path.exists(filename):
+        with open(filename, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            existing = {row[0]: row for row in reader if row}
+    existing.update((row[0], row) for row in rows)
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(existing[key] for key in sorted(existing))
+    os.replace(tmp, filename)
+
+
+def aggregate_all(config=None, full=False, state_file=STATE_FILE):
+    """
+    按配置增量汇总所有指数分组的每日总成交额
+
+    分组及成分ETF都在 index_groups.json 中配置，新增分组只需增加一项配置。
+    每只ETF记录已汇总到的最后日期（高水位），只读取其后的新行，再只对这些
+    日期重算并写入分组汇总。出现高水位之前的补录数据、分组成分变化或
+    full=True 时，该分组全量重算。返回 {分组名: 本次写入的日期数组}
+    """
+    config = config or load_config()
+    groups = config["groups"]
+    state = {"codes": {}, "groups": {}} if full else load_state(state_file)
+
+    columns, new_dates, backfilled = {}, {}, set()
+    for code in dict.fromkeys(code for group in groups.values() for code in group["codes"]):
+        try:
+            columns[code] = load_bars(code)
+        except FileNotFoundError:
+            # load_group_totals 会提示缺失的ETF
+            continue
+        dates = columns[code]["date"]
+        seen = state["codes"].get(code)
+        if seen is None:
+            backfilled.add(code)
+            continue
+        start = np.searchsorted(dates, seen["last"], side="right")
+        if len(dates) - seen["rows"] != len(dates) - start:
+            # 行数增加得比高水位之后的新行多，说明有补录的历史日期
+            backfilled.add(code)
+        new_dates[code] = np.asarray(dates[start:])
+
+    rebuild = {name: (state["groups"].get(name, {}).get("codes") != group["codes"]
+                      or any(code in backfilled for code in group["codes"])
+                      or not os.path.exists(group["output"]))
+               for name, group in groups.items()}
+    # 都是增量更新时只读取最早高水位之后的数据，再按分组筛出受影响的日期
+    seen_last = [state["codes"][code]["last"] for code in new_dates]
+    since = None if any(rebuild.values()) or not seen_last else min(seen_last)
+    all_dates, totals = load_group_totals(groups, since=since)
+
+    written = {}
+    for name, group in groups.items():
+        codes = group["codes"]
+        filename = group["output"]
+        last_date = state["groups"].get(name, {}).get("last")
+        if rebuild[name]:
+            dates, total = all_dates, totals[name]
+            write_group(filename, dates, total)
+        else:
+            affected = np.isin(all_dates, np.concatenate(
+                [new_dates[code] for code in codes if code in new_dates]
+                or [np.array([], dtype=np.int32)]))
+            dates, total = all_dates[affected], totals[name][affected]
+            upsert_group(filename, dates, total, last_date)
+
+        valid = dates[total == total]
+        if len(valid):
+            last_date = max(int(valid[-1]), last_date or 0)
+        state["groups"][name] = {"codes": codes, "last": last_date}
+        written[name] = valid
+        mode = "全量重算" if rebuild[name] else "增量更新"
+        print(f"{name}: {mode} {len(valid)} 个交易日，数据已保存到 {filename}")
+
+    for code, bars in columns.items():
+        if len(bars["date"]):
+            state["codes"][code] = {"last": int(bars["date"][-1]), "rows": len(bars["date"])}
+    save_state(state, state_file)
+    return written
+
+
+if __name__ == "__main__":
+    aggregate_all(full="--full" in sys.argv[1:])
@@ -0,0 +1,173 @@
+import csv
+import os
+
+# 统一的CSV表头（上证、深圳共用）
+CSV_HEADER = [
+    "证券名称", "证券代码", "交易日期", "前收价", "开盘价",
+    "最高价", "最低价", "收盘价", "涨跌幅(%)",
+    "成交量(万份)", "成交额(万元)", "数据完整性"
+]
+
+# 数值字段及其在CSV中的列名
+NUMERIC_FIELDS = [
+    ("prev_close", "前收价"),
+    ("open", "开盘价"),
+    ("high", "最高价"),
+    ("low", "最低价"),
+    ("close", "收盘价"),
+    ("change_pct", "涨跌幅(%)"),
+    ("volume", "成交量(万份)"),
+    ("amount", "成交额(万元)"),
+]
+
+
+def parse_number(value):
+    """
+    解析数值，兼容深圳接口的千分位格式（"118,137.68"），空值返回 None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.replace(",", "").replace('"', "").strip()
+    return float(value) if value else None
+
+
+def parse_date(value):
+    """
+    统一日期为 YYYYMMDD 形式的整数，空值返回 None
+    """
+    value = str(value or "").replace("-", "").strip()
+    return int(value) if value else None
+
+
+def format_number(value):
+    return "" if value is None else repr(value)
+
+
+class Bar:
+    """
+    统一的日线记录：数值在入库时解析一次，日期统一为 YYYYMMDD 整数
+    """
+    __slots__ = ("name", "code", "exchange", "date", "prev_close", "open", "high", "low",
+                 "close", "change_pct", "volume", "amount", "complete")
+
+    def __init__(self, name="", code="", exchange="", date=None, prev_close=None, open=None,
+                 high=None, low=None, close=None, change_pct=None, volume=None, amount=None,
+                 complete=False):
+        self.name = name
+        self.code = code
+        self.exchange = exchange
+        self.date = date
+        self.prev_close = prev_close
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.change_pct = change_pct
+        self.volume = volume
+        self.amount = amount
+        self.complete = complete
+
+    @classmethod
+    def from_sse(cls, result):
+        """
+        由上证接口 result 中的一条记录生成
+        """
+        return cls(
+            name=result.get('SEC_NAME', ''),
+            code=result.get('SEC_CODE', ''),
+            exchange="SH",
+            date=parse_date(result.get('TX_DATE')),
+            high=parse_number(result.get('HIGH_PRICE')),
+            low=parse_number(result.get('LOW_PRICE')),
+            close=parse_number(result.get('CLOSE_PRICE')),
+            change_pct=parse_number(result.get('CHANGE_RATE')),
+            volume=parse_number(result.get('TRADE_VOL')),
+            amount=parse_number(result.get('TRADE_AMT')),
+            complete=True,
+        )
+
+    @classmethod
+    def from_szse(cls, result):
+        """
+        由深圳接口 data 中的一条记录生成
+        """
+        return cls(
+            name=result.get('zqjc', ''),
+            code=result.get('zqdm', ''),
+            exchange="SZ",
+            date=parse_date(result.get('jyrq')),
+            prev_close=parse_number(result.get('qss')),
+            open=parse_number(result.get('ks')),
+            high=parse_number(result.get('zg')),
+            low=parse_number(result.get('zd')),
+            close=parse_number(result.get('ss')),
+            change_pct=parse_number(result.get('sdf')),
+            volume=parse_number(result.get('cjgs')),
+            amount=parse_number(result.get('cjje')),
+            complete=True,
+        )
+
+    @classmethod
+    def failed(cls, code, exchange, date):
+        """
+        请求失败或无数据时的占位记录，保留代码和日期以便之后覆盖
+        """
+        return cls(code=code, exchange=exchange, date=parse_date(date), complete=False)
+
+    @classmethod
+    def from_row(cls, row, exchange=""):
+        """
+        由 {列名: 值} 形式的CSV行生成，兼容旧的上证/深圳表头
+        """
+        values = {field: parse_number(row.get(column)) for field, column in NUMERIC_FIELDS}
+        return cls(name=row.get("证券名称", ""), code=row.get("证券代码", ""), exchange=exchange,
+                   date=parse_date(row.get("交易日期")),
+                   complete=row.get("数据完整性") == "是", **values)
+
+    def to_row(self):
+        """
+        按统一表头输出CSV行
+        """
+        return [
+            self.name, self.code, "" if self.date is None else str(self.date),
+            *(format_number(getattr(self, field)) for field, _ in NUMERIC_FIELDS),
+            "是" if self.complete else "否",
+        ]
+
+
+def _is_normalized(row):
+    """
+    行是否已是统一格式：日期不含连字符，数值不含千分位
+    """
+    return "-" not in row[2] and not any("," in value for value in row[3:-1])
+
+
+def migrate_csv(filename):
+    """
+    把旧格式（上证10列表头、深圳的千分位数值和 YYYY-MM-DD 日期）的CSV原子改写为统一格式
+
+    没有交易日期的旧失败行无法对应到任何日期，迁移时丢弃。已是统一格式时不做改动。
+    """
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return False
+        rows = list(reader)
+    if header == CSV_HEADER and all(len(row) == len(header) and row[2] and _is_normalized(row)
+                                    for row in rows):
+        return False
+
+    bars = [Bar.from_row(dict(zip(header, row))) for row in rows]
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(bar.to_row() for bar in bars if bar.date is not None)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+    print(f"{filename} 已迁移为统一格式")
+    return True
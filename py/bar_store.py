@@ -0,0 +1,205 @@
+import csv
+import json
+import os
+import shutil
+from bar_schema import CSV_HEADER, migrate_csv
+
+# 交易日期与数据完整性所在列名（上证/深圳两种表头相同）
+DATE_COLUMN = "交易日期"
+COMPLETE_COLUMN = "数据完整性"
+
+
+def date_key(value):
+    """
+    统一日期键为 YYYYMMDD（上证为 20260105，深圳为 2026-01-05）
+    """
+    return value.replace("-", "").strip()
+
+
+class BarStore:
+    """
+    单个证券CSV文件的幂等存储，按交易日期做 upsert
+
+    旁边的索引文件 <csv>.idx 记录 {交易日期: 数据完整性}，以及生成索引时
+    CSV 的大小和修改时间；两者一致时直接加载索引，不再扫描 CSV，
+    因此“是否已有该日数据”的判断为 O(1)。
+    """
+
+    def __init__(self, filename, header):
+        self.filename = filename
+        self.index_file = f"{filename}.idx"
+        self.header = header
+        self.pending = {}
+        self.index = self._load_index()
+
+    def status(self, date):
+        """
+        返回该日已保存行的数据完整性（"是"/"否"），没有记录时返回 None
+        """
+        key = date_key(date)
+        if key in self.pending:
+            return self.pending[key][self.header.index(COMPLETE_COLUMN)]
+        return self.index.get(key)
+
+    def has(self, date):
+        """
+        该日是否已有完整数据
+        """
+        return self.status(date) == "是"
+
+    def upsert(self, row):
+        """
+        缓存一行，按交易日期覆盖旧行；已完整的数据不会被失败行覆盖
+        """
+        date_index = self.header.index(DATE_COLUMN)
+        key = date_key(row[date_index])
+        if not key:
+            # 没有交易日期的行无法去重，直接追加
+            self.pending[f"#{len(self.pending)}"] = row
+            return
+        if row[self.header.index(COMPLETE_COLUMN)] != "是" and self.has(key):
+            return
+        self.pending[key] = row
+
+    def __len__(self):
+        return len(self.pending)
+
+    def flush(self):
+        """
+        原子写出缓存行：全是新日期时只追加，否则重写并原地替换旧行
+        """
+        if not self.pending:
+            return 0
+        # 写出的行（含原地替换的行）都要更新到索引，因此不从 pending 中移除
+        written = dict(self.pending)
+        count = len(written)
+        exists = os.path.exists(self.filename) and os.path.getsize(self.filename) > 0
+        replaces = [key for key in written if key in self.index]
+        tmp = f"{self.filename}.tmp"
+
+        if exists and replaces:
+            with open(self.filename, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                date_index = header.index(DATE_COLUMN)
+                complete_index = header.index(COMPLETE_COLUMN)
+                rows = []
+                positions = {}
+                for row in reader:
+                    key = date_key(row[date_index]) if len(row) > date_index else ""
+                    if not key:
+                        rows.append(row)
+                    elif key in positions:
+                        # 历史遗留的重复日期只保留一行，优先保留完整数据
+                        if row[complete_index] == "是":
+                            rows[positions[key]] = row
+                    else:
+                        positions[key] = len(rows)
+                        rows.append(row)
+            replaced = set()
+            for key in replaces:
+                if key in positions:
+                    rows[positions[key]] = written[key]
+                    replaced.add(key)
+            rows.extend(row for key, row in written.items() if key not in replaced)
+            with open(tmp, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            if exists:
+                shutil.copyfile(self.filename, tmp)
+            with open(tmp, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if not exists:
+                    writer.writerow(self.header)
+                writer.writerows(written.values())
+                f.flush()
+                os.fsync(f.fileno())
+
+        os.replace(tmp, self.filename)
+        for key, row in written.items():
+            if not key.startswith("#"):
+                self.index[key] = row[self.header.index(COMPLETE_COLUMN)]
+        self.pending = {}
+        self._save_index()
+        return count
+
+    def _stat(self):
+        st = os.stat(self.filename)
+        return st.st_size, st.st_mtime_ns
+
+    def _load_index(self):
+        if not os.path.exists(self.filename):
+            return {}
+        size, mtime_ns = self._stat()
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved["size"] == size and saved["mtime_ns"] == mtime_ns:
+                return saved["dates"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        # 索引失效时CSV可能是旧格式，先迁移为统一格式再重建索引
+        if self.header == CSV_HEADER:
+            migrate_csv(self.filename)
+        return self._rebuild_index()
+
+    def _rebuild_index(self):
+        """
+        扫描一次CSV重建索引（索引缺失或CSV被外部修改时）
+        """
+        index = {}
+        with open(self.filename, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return index
+            date_index = header.index(DATE_COLUMN)
+            complete_index = header.index(COMPLETE_COLUMN)
+            for row in reader:
+                if len(row) <= max(date_index, complete_index):
+                    continue
+                key = date_key(row[date_index])
+                if key and index.get(key) != "是":
+                    index[key] = row[complete_index]
+        self.index = index
+        self._save_index()
+        return index
+
+    def _save_index(self):
+        size, mtime_ns = self._stat()
+        tmp = f"{self.index_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"size": size, "mtime_ns": mtime_ns, "dates": self.index}, f)
+        os.replace(tmp, self.index_file)
+
+
+def self_check():
+    """
+    回归检查：失败 → 完整 → 失败 依次写入同一日期后，CSV 和索引都应保留完整行
+    """
+    import tempfile
+    from bar_schema import Bar
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "510300_SH.csv")
+        complete = Bar(name="300ETF", code="510300", exchange="SH", date=20260105, close=4.844,
+                       volume=101713.25, amount=490206.18, complete=True).to_row()
+        failed = Bar.failed("510300", "SH", "2026-01-05").to_row()
+        for row in (failed, complete, failed):
+            store = BarStore(filename, CSV_HEADER)
+            store.upsert(row)
+            store.flush()
+
+        store = BarStore(filename, CSV_HEADER)
+        assert store.status("20260105") == "是", f"索引为 {store.status('20260105')}"
+        with open(filename, 'r', newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))[1:]
+        assert [row[-1] for row in rows] == ["是"], f"CSV 为 {rows}"
+    print("BarStore 回归检查通过")
+
+
+if __name__ == "__main__":
+    self_check()
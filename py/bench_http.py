@@ -0,0 +1,62 @@
+import statistics
+import sys
+import time
+import response_cache
+import sse_data_fetcher
+import szse_data_fetcher
+from http_session import build_session
+from mock_exchange import start_mock_server
+
+# 每种方式的请求次数
+N_REQUESTS = 200
+
+
+def time_requests(fetch, n, make_session):
+    """
+    顺序发送 n 次请求，返回每次请求耗时（毫秒）
+    """
+    latencies = []
+    for i in range(n):
+        session = make_session()
+        t0 = time.perf_counter()
+        data = fetch(session)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if data is None:
+            raise RuntimeError("模拟服务器请求失败")
+    return latencies
+
+
+def report(name, latencies):
+    print(f"{name:<28} 平均 {statistics.mean(latencies):7.3f} ms  "
+          f"中位数 {statistics.median(latencies):7.3f} ms  "
+          f"P95 {sorted(latencies)[int(len(latencies) * 0.95)]:7.3f} ms")
+
+
+def main(n=N_REQUESTS):
+    # 关闭原始响应缓存，保证每次都真正发出请求
+    response_cache.CACHE_ENABLED = False
+    server, base_url = start_mock_server()
+    sse_data_fetcher.SSE_URL = f"{base_url}/commonQuery.do"
+    szse_data_fetcher.SZSE_URL = f"{base_url}/api/report/ShowReport/data"
+
+    fetchers = {
+        "上证": lambda session: sse_data_fetcher.fetch_sse_data("510300", "2026-01-05", session=session),
+        "深圳": lambda session: szse_data_fetcher.fetch_szse_data("159919", "2026-01-05", session=session),
+    }
+
+    print(f"本地模拟服务器: {base_url}，每种方式 {n} 次请求")
+    for exchange, fetch in fetchers.items():
+        # 旧方式：每次请求新建会话（每次都要重新建立TCP连接）
+        fresh = time_requests(fetch, n, build_session)
+        # 新方式：共享长连接会话
+        shared_session = build_session()
+        pooled = time_requests(fetch, n, lambda: shared_session)
+        report(f"{exchange} 每次新建会话", fresh)
+        report(f"{exchange} 共享连接池", pooled)
+        print(f"{exchange} 平均延迟下降 {1 - statistics.mean(pooled) / statistics.mean(fresh):.1%}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_REQUESTS)
@@ -0,0 +1,94 @@
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 每项测量重复的次数（每次都是新的 Python 进程）
+N_RUNS = 5
+
+# 各入口以前在模块加载时就导入的库
+EAGER_IMPORTS = "import pandas, numpy, matplotlib.pyplot, matplotlib.font_manager, matplotlib.ticker"
+
+TIMER = """
+import sys, time
+sys.path.insert(0, {script_dir!r})
+t0 = time.perf_counter()
+{code}
+print(time.perf_counter() - t0)
+"""
+
+
+def time_in_subprocess(code, cwd=None, setup=""):
+    """
+    在新进程中执行 code，返回耗时（毫秒）；setup 在计时前执行
+    """
+    source = setup + "\n" + TIMER.format(script_dir=SCRIPT_DIR, code=code)
+    result = subprocess.run([sys.executable, "-c", source], cwd=cwd,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+def measure(code, n=N_RUNS, **kwargs):
+    return [time_in_subprocess(code, **kwargs) for _ in range(n)]
+
+
+def report(name, timings):
+    print(f"{name:<36} 中位数 {statistics.median(timings):8.1f} ms  "
+          f"最小 {min(timings):8.1f} ms")
+
+
+def bench_imports(n=N_RUNS):
+    print("=== 模块加载 ===")
+    eager = measure(EAGER_IMPORTS, n)
+    lazy = measure("import mad", n)
+    report("原方式：加载即导入 pandas/matplotlib", eager)
+    report("现方式：import mad", lazy)
+    print(f"加载时间下降 {1 - statistics.median(lazy) / statistics.median(eager):.1%}")
+
+    calendar = measure("import trade_calendar", n)
+    report("import trade_calendar (day.py)", calendar)
+    try:
+        report("import akshare（原 day.py）", measure("import akshare", n))
+    except subprocess.CalledProcessError:
+        print("未安装 akshare，跳过对比")
+
+
+def bench_font(n=N_RUNS):
+    """
+    字体注册：无缓存（列目录 + 解析TTF）与读取 .cache/font.json 的对比
+    """
+    import matplotlib
+    print("\n=== 字体注册 ===")
+    font_dir = tempfile.mkdtemp()
+    workdir = tempfile.mkdtemp()
+    try:
+        # 使用 matplotlib 自带的字体代替仓库中的中文字体
+        bundled = os.path.join(matplotlib.get_data_path(), "fonts", "ttf", "DejaVuSans.ttf")
+        shutil.copy(bundled, font_dir)
+        setup = f"import sys; sys.path.insert(0, {SCRIPT_DIR!r}); import matplotlib.font_manager, render"
+        code = f"render.setup_font({font_dir!r})"
+        cold, cached = [], []
+        for _ in range(n):
+            shutil.rmtree(os.path.join(workdir, ".cache"), ignore_errors=True)
+            cold.append(time_in_subprocess(code, cwd=workdir, setup=setup))
+            cached.append(time_in_subprocess(code, cwd=workdir, setup=setup))
+        report("无缓存：查找并解析字体", cold)
+        report("有缓存：读取 font.json", cached)
+        print(f"字体注册时间下降 {1 - statistics.median(cached) / statistics.median(cold):.1%}")
+    finally:
+        shutil.rmtree(font_dir, ignore_errors=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(n=N_RUNS):
+    print(f"Python {sys.version.split()[0]}，每项 {n} 个新进程")
+    bench_imports(n)
+    bench_font(n)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_RUNS)
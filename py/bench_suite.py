@@ -0,0 +1,382 @@
+import csv
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认规模：数百只ETF、十年以上日线，少量ETF的分钟线
+N_CODES = 300
+YEARS = 12
+END_DATE = datetime.date(2025, 12, 31)
+MINUTE_CODES = 4
+MINUTE_DAYS = 250
+
+# 通过模拟交易所抓取的规模（上证逐日请求，深圳区间请求）
+FETCH_CODES = 10
+FETCH_DAYS = 60
+
+# 每个指数分组的成分数
+GROUP_SIZE = 10
+
+# 成交量图只画最近若干个交易日（与日常图表一致），且只画前若干个分组
+RENDER_DAYS = 60
+RENDER_GROUPS = 5
+
+# 比较结果时，耗时超过基线该倍数且至少多出 REGRESSION_SECONDS 秒视为性能回退
+REGRESSION_RATIO = 1.2
+REGRESSION_SECONDS = 0.05
+
+# 默认结果文件（机器可读）
+OUTPUT_FILE = "bench_results.json"
+
+# 分钟线的列定义：时间为 YYYYMMDDHHMM 形式的 int64
+MINUTE_COLUMNS = {
+    "date": np.int64,
+    "close": np.float64,
+    "volume": np.float64,
+    "amount": np.float64,
+}
+
+# 每个交易日的分钟（09:31-11:30, 13:01-15:00），HHMM 形式
+MINUTES = np.array([h * 100 + m for h, m in
+                    [divmod(t, 60) for t in range(9 * 60 + 31, 11 * 60 + 31)]
+                    + [divmod(t, 60) for t in range(13 * 60 + 1, 15 * 60 + 1)]], dtype=np.int64)
+
+
+def weekdays(start, end):
+    """
+    [start, end] 内的工作日，YYYYMMDD 整数数组
+    """
+    span = np.arange(np.datetime64(start), np.datetime64(end) + 1)
+    span = span[np.is_busday(span)]
+    years = span.astype('datetime64[Y]')
+    months = span.astype('datetime64[M]')
+    return ((years.astype(np.int64) + 1970) * 10000 + (months - years).astype(np.int64) * 100
+            + 100 + (span - months).astype(np.int64) + 1)
+
+
+def synthetic_history(rng, n):
+    """
+    随机游走的价格与对数正态分布的成交量，偶尔出现放量（供MAD检测）
+    """
+    close = 3.0 * np.exp(np.cumsum(rng.normal(0, 0.012, n)))
+    prev_close = np.concatenate([[close[0]], close[:-1]])
+    open_price = prev_close * (1 + rng.normal(0, 0.003, n))
+    high = np.maximum(open_price, close) * (1 + rng.uniform(0, 0.01, n))
+    low = np.minimum(open_price, close) * (1 - rng.uniform(0, 0.01, n))
+    volume = rng.lognormal(11, 0.35, n)
+    volume[rng.random(n) < 0.01] *= 4
+    return {"prev_close": prev_close, "open": open_price, "high": high, "low": low,
+            "close": close, "change_pct": (close / prev_close - 1) * 100,
+            "volume": volume, "amount": volume * close}
+
+
+def write_history_csv(filename, code, exchange, dates, bars):
+    """
+    按统一表头写出一只ETF的历史CSV
+
+    上证格式与交易所返回一致，没有前收价和开盘价，涨跌幅保留5位小数；
+    深圳格式各价格保留3位、涨跌幅保留2位小数
+    """
+    from bar_schema import CSV_HEADER
+    name = f"ETF{code}"
+    if exchange == "SH":
+        rows = ([name, code, str(d), "", "", f"{h:.3f}", f"{lo:.3f}", f"{c:.3f}", f"{p:.5f}",
+                 f"{v:.2f}", f"{a:.2f}", "是"]
+                for d, h, lo, c, p, v, a in zip(dates.tolist(), bars["high"], bars["low"], bars["close"],
+                                                bars["change_pct"], bars["volume"], bars["amount"]))
+    else:
+        rows = ([name, code, str(d), f"{pc:.3f}", f"{o:.3f}", f"{h:.3f}", f"{lo:.3f}", f"{c:.3f}",
+                 f"{p:.2f}", f"{v:.2f}", f"{a:.2f}", "是"]
+                for d, pc, o, h, lo, c, p, v, a in zip(dates.tolist(), bars["prev_close"], bars["open"],
+                                                       bars["high"], bars["low"], bars["close"],
+                                                       bars["change_pct"], bars["volume"], bars["amount"]))
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+
+
+def generate_dataset(n_codes=N_CODES, years=YEARS, minute_codes=MINUTE_CODES,
+                     minute_days=MINUTE_DAYS, seed=0):
+    """
+    在当前目录生成合成数据集，返回 (代码列表, 日线行数, 分钟线行数)
+
+    一半为上证（51xxxx_SH），一半为深圳（159xxx_SZ）；分钟线直接写入列式存储
+    （存储名 <代码>_min）。相同参数和种子生成的数据完全相同。
+    """
+    from columnar_store import write_bars
+    rng = np.random.default_rng(seed)
+    dates = weekdays(END_DATE - datetime.timedelta(days=365 * years), END_DATE)
+    codes = []
+    for i in range(n_codes):
+        code = f"{510000 + i}_SH" if i % 2 == 0 else f"{159000 + i}_SZ"
+        number, exchange = code.split("_")
+        write_history_csv(f"{code}.csv", number, exchange, dates, synthetic_history(rng, len(dates)))
+        codes.append(code)
+
+    minute_rows = 0
+    days = dates[-minute_days:]
+    times = (np.repeat(days * 10000, len(MINUTES)) + np.tile(MINUTES, len(days)))
+    for code in codes[:minute_codes]:
+        bars = synthetic_history(rng, len(times))
+        write_bars(f"{code}_min", {"date": times, "close": bars["close"],
+                                   "volume": bars["volume"] / len(MINUTES),
+                                   "amount": bars["amount"] / len(MINUTES)}, schema=MINUTE_COLUMNS)
+        minute_rows += len(times)
+    return codes, len(codes) * len(dates), minute_rows
+
+
+def build_config(codes, group_size=GROUP_SIZE):
+    """
+    把合成的代码按顺序分组，生成与 index_groups.json 结构相同的配置
+    """
+    groups = {}
+    for i in range(0, len(codes), group_size):
+        name = f"组{i // group_size + 1:03d}"
+        groups[name] = {"codes": codes[i:i + group_size], "output": f"{name}ETF.csv",
+                        "fallback_baseline": 1.0,
+                        "chart": {"title": f"{name} ETF成交量", "ymax": 10, "ytick": 1}}
+    return {"baseline": {"start": 20230101, "end": 20231231}, "excess_ratio": 0.2, "groups": groups}
+
+
+class Recorder:
+    """
+    记录各阶段耗时和处理的行数
+    """
+
+    def __init__(self):
+        self.results = {}
+
+    def time(self, name, func, rows=None):
+        t0 = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - t0
+        rows = rows(result) if callable(rows) else rows
+        entry = {"seconds": round(seconds, 4)}
+        if rows:
+            entry["rows"] = int(rows)
+            entry["rows_per_sec"] = round(rows / seconds, 1) if seconds > 0 else None
+        self.results[name] = entry
+        speed = f"  {entry['rows']} 行, {entry['rows_per_sec']:,.0f} 行/秒" if rows else ""
+        print(f"{name:<28} {seconds:9.3f} 秒{speed}")
+        return result
+
+
+def bench_fetch(recorder, fetch_codes=FETCH_CODES, fetch_days=FETCH_DAYS):
+    """
+    抓取到存储：对本地模拟交易所抓取上证（逐日）和深圳（区间）数据，写CSV并更新列式存储
+    """
+    import response_cache
+    import sse_data_fetcher
+    import szse_data_fetcher
+    import trade_calendar
+    from mock_exchange import start_mock_server
+
+    # 不读写原始响应缓存、不下载交易日历（按工作日处理），不限速
+    response_cache.CACHE_ENABLED = False
+    trade_calendar._download_tried = True
+    server, base_url = start_mock_server()
+    sse_data_fetcher.SSE_URL = f"{base_url}/commonQuery.do"
+    szse_data_fetcher.SZSE_URL = f"{base_url}/api/report/ShowReport/data"
+    end = END_DATE
+    start = end - datetime.timedelta(days=fetch_days * 7 // 5)
+    n_days = len(weekdays(start, end))
+    sh_codes = [str(520000 + i) for i in range(fetch_codes)]
+    sz_codes = [str(159500 + i) for i in range(fetch_codes)]
+    try:
+        recorder.time("抓取入库 上证(逐日)",
+                      lambda: _quietly(sse_data_fetcher.sh_fetch_and_save_data,
+                                       sh_codes, start, end, rate=1e6),
+                      rows=len(sh_codes) * n_days)
+        recorder.time("抓取入库 深圳(区间)",
+                      lambda: _quietly(szse_data_fetcher.sz_fetch_and_save_data,
+                                       sz_codes, start, end, rate=1e6),
+                      rows=len(sz_codes) * n_days)
+    finally:
+        server.shutdown()
+
+
+def bench_history(recorder, n_codes=N_CODES, years=YEARS, minute_codes=MINUTE_CODES,
+                  minute_days=MINUTE_DAYS):
+    """
+    在合成的多年历史上测量：CSV→列式存储、分组汇总、MAD检测、绘图
+    """
+    from aggregate import aggregate_all
+    from columnar_store import load_bars, rebuild_all
+    from index_groups import load_group_totals
+    from mad_engine import align_series, batch_lagged_mad, lagged_rolling_mad
+
+    codes, daily_rows, minute_rows = recorder.time(
+        "生成合成数据", lambda: generate_dataset(n_codes, years, minute_codes, minute_days),
+        rows=lambda result: result[1] + result[2])
+    config = build_config(codes)
+    groups = config["groups"]
+
+    recorder.time("CSV转列式存储", lambda: _quietly(rebuild_all),
+                  rows=daily_rows)
+    recorder.time("分组汇总(全量)", lambda: _quietly(aggregate_all, config, full=True), rows=daily_rows)
+    recorder.time("分组汇总(无新数据)", lambda: _quietly(aggregate_all, config), rows=daily_rows)
+    dates, totals = recorder.time("读取分组合计", lambda: load_group_totals(groups), rows=daily_rows)
+
+    def detect_groups():
+        for total in totals.values():
+            lagged_rolling_mad(total[~np.isnan(total)], k=20, threshold=2.0)
+    recorder.time("MAD检测 分组(逐条)", detect_groups, rows=len(totals) * len(dates))
+
+    def detect_universe():
+        series = []
+        for code in codes:
+            bars = load_bars(code)
+            series.append((bars["date"], bars["amount"]))
+        _, matrix = align_series(series)
+        return batch_lagged_mad(matrix, ks=(10, 20, 40))
+    recorder.time("MAD检测 全部ETF(批量)", detect_universe, rows=daily_rows)
+
+    def detect_minutes():
+        for code in codes[:minute_codes]:
+            lagged_rolling_mad(np.asarray(load_bars(f"{code}_min", schema=MINUTE_COLUMNS)["amount"]),
+                               k=20, threshold=2.0)
+    recorder.time("MAD检测 分钟线", detect_minutes, rows=minute_rows)
+
+    bench_render(recorder, dates, totals, config)
+
+
+def bench_render(recorder, dates, totals, config):
+    from render import render_charts, volume_chart_specs
+    import mad
+    import pandas as pd
+
+    recent = {name: total[-RENDER_DAYS:] for name, total in totals.items()}
+    specs = volume_chart_specs(dates[-RENDER_DAYS:], recent, config, "bench")[:RENDER_GROUPS]
+    recorder.time("绘图 成交量图", lambda: _quietly(render_charts, specs), rows=len(specs))
+    recorder.time("绘图 成交量图(缓存命中)", lambda: _quietly(render_charts, specs), rows=len(specs))
+
+    # 多年的分组合计走长历史模式
+    name, total = next(iter(totals.items()))
+    keep = ~np.isnan(total)
+    df = pd.DataFrame({"交易日期": dates[keep], "总成交额(万元)": total[keep]})
+    full, start = _quietly(mad.detect, df.iloc[:20], df.iloc[20:])
+    recorder.time("绘图 MAD长历史图", lambda: _quietly(mad.plot, full, start, "bench_mad.png"),
+                  rows=len(full) - start)
+
+
+def _quietly(func, *args, **kwargs):
+    """
+    调用时屏蔽被测函数的打印输出和警告（例如缺少字形的提示）
+    """
+    import contextlib
+    import io
+    import warnings
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return func(*args, **kwargs)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "time": datetime.datetime.now().isoformat(timespec="seconds")}
+
+
+def compare(results, baseline_file):
+    """
+    与之前保存的结果逐项比较，返回明显变慢的阶段
+    """
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n=== 与 {baseline_file}（{baseline['environment'].get('commit')}）比较 ===")
+    if baseline.get("params") != results["params"]:
+        print(f"注意: 基线的规模参数不同 {baseline.get('params')}，结果不可直接比较")
+    regressions = []
+    for name, entry in results["results"].items():
+        old = baseline["results"].get(name)
+        if not old or not old["seconds"]:
+            continue
+        ratio = entry["seconds"] / old["seconds"]
+        slower = ratio > REGRESSION_RATIO and entry["seconds"] - old["seconds"] > REGRESSION_SECONDS
+        flag = "  <- 变慢" if slower else ""
+        print(f"{name:<28} {old['seconds']:9.3f} -> {entry['seconds']:9.3f} 秒 ({ratio:.2f}x){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def run(params=None, output=OUTPUT_FILE, baseline_file=None, keep=False):
+    """
+    在临时目录中运行全部基准测试，结果写入 output（JSON）
+
+    params: 覆盖默认规模，例如 {"n_codes": 50, "years": 3}
+    """
+    params = dict({"n_codes": N_CODES, "years": YEARS, "minute_codes": MINUTE_CODES,
+                   "minute_days": MINUTE_DAYS, "fetch_codes": FETCH_CODES,
+                   "fetch_days": FETCH_DAYS}, **(params or {}))
+    output = os.path.abspath(output)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    recorder = Recorder()
+    print(f"基准测试目录: {workdir}，参数: {params}")
+    try:
+        os.makedirs(os.path.join(workdir, "fetch"))
+        os.makedirs(os.path.join(workdir, "history"))
+        os.chdir(os.path.join(workdir, "fetch"))
+        bench_fetch(recorder, params["fetch_codes"], params["fetch_days"])
+        os.chdir(os.path.join(workdir, "history"))
+        bench_history(recorder, params["n_codes"], params["years"], params["minute_codes"],
+                      params["minute_days"])
+    finally:
+        os.chdir(cwd)
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {"environment": environment(), "params": params, "results": recorder.results}
+    tmp = f"{output}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, output)
+    print(f"\n结果已保存到 {output}")
+
+    if baseline_file:
+        return results, compare(results, baseline_file)
+    return results, []
+
+
+def main(argv):
+    """
+    python py/bench_suite.py [--quick] [--output 文件] [--compare 基线文件] [--keep] [参数=值 ...]
+
+    --quick：小规模（20只ETF、3年），用于快速检查；参数=值 覆盖单项规模，例如 n_codes=100
+    """
+    args = list(argv)
+    params = {"n_codes": 20, "years": 3, "minute_codes": 1, "minute_days": 20,
+              "fetch_codes": 2, "fetch_days": 10} if "--quick" in args else {}
+    output, baseline_file = OUTPUT_FILE, None
+    for i, arg in enumerate(args):
+        if arg == "--output":
+            output = args[i + 1]
+        elif arg == "--compare":
+            baseline_file = args[i + 1]
+        elif "=" in arg:
+            key, value = arg.split("=", 1)
+            params[key] = int(value)
+    _, regressions = run(params, output, baseline_file, keep="--keep" in args)
+    if regressions:
+        print(f"以下阶段耗时超过基线的 {REGRESSION_RATIO} 倍: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,140 @@
+import csv
+import glob
+import json
+import os
+import sys
+import numpy as np
+from bar_schema import migrate_csv
+
+# 列式存储目录：每个证券一个子目录，每列一个 .npy 文件
+STORE_DIR = "store"
+
+# 列名与类型：日期为 YYYYMMDD 形式的 int32，其余均为 float64（缺失为 NaN）
+COLUMNS = {
+    "date": np.int32,
+    "prev_close": np.float64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "change_pct": np.float64,
+    "volume": np.float64,
+    "amount": np.float64,
+}
+
+# CSV表头到列名的映射（上证、深圳两种表头都适用）
+CSV_COLUMNS = {
+    "交易日期": "date",
+    "前收价": "prev_close",
+    "开盘价": "open",
+    "最高价": "high",
+    "最低价": "low",
+    "收盘价": "close",
+    "涨跌幅(%)": "change_pct",
+    "成交量(万份)": "volume",
+    "成交额(万元)": "amount",
+}
+
+
+def store_name(filename):
+    """
+    CSV文件名对应的存储名，例如 510300_SH.csv -> 510300_SH
+    """
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def _parse_number(value):
+    return float(value) if value else np.nan
+
+
+def read_csv_bars(filename):
+    """
+    读取单个证券CSV中数据完整的行，按日期升序去重（同一日期保留最后一行）
+
+    CSV 为统一格式（见 bar_schema），数值无需再做千分位等清洗
+    """
+    rows = {}
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        fields = [(i, CSV_COLUMNS[name]) for i, name in enumerate(header) if name in CSV_COLUMNS]
+        complete_index = header.index("数据完整性")
+        date_index = header.index("交易日期")
+        for row in reader:
+            if len(row) != len(header) or row[complete_index] != "是":
+                continue
+            date = int(row[date_index])
+            rows[date] = {field: _parse_number(row[i]) for i, field in fields if field != "date"}
+
+    dates = sorted(rows)
+    columns = {"date": np.array(dates, dtype=np.int32)}
+    for field, dtype in COLUMNS.items():
+        if field != "date":
+            columns[field] = np.array([rows[d].get(field, np.nan) for d in dates], dtype=dtype)
+    return columns
+
+
+def write_bars(name, columns, store_dir=STORE_DIR, schema=COLUMNS):
+    """
+    写入一个证券的全部列：每列先写临时文件再原子替换，最后写 meta.json
+
+    schema 为 {列名: 类型}，默认是日线的列；其他数据（如份额净值）可传入自己的列定义
+    """
+    path = os.path.join(store_dir, name)
+    os.makedirs(path, exist_ok=True)
+    rows = len(columns["date"])
+    for field, dtype in schema.items():
+        data = np.ascontiguousarray(columns.get(field, np.full(rows, np.nan)), dtype=dtype)
+        tmp = os.path.join(path, f"{field}.tmp.npy")
+        np.save(tmp, data)
+        os.replace(tmp, os.path.join(path, f"{field}.npy"))
+    tmp = os.path.join(path, "meta.json.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"rows": rows, "columns": list(schema)}, f)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+
+
+def build_from_csv(filename, store_dir=STORE_DIR):
+    """
+    由CSV重建对应的列式存储，返回写入的行数
+    """
+    migrate_csv(filename)
+    columns = read_csv_bars(filename)
+    write_bars(store_name(filename), columns, store_dir)
+    return len(columns["date"])
+
+
+def load_bars(name, store_dir=STORE_DIR, mmap=True, schema=COLUMNS):
+    """
+    读取一个证券的全部列，默认以内存映射方式零拷贝加载
+
+    返回 {列名: 数组}；日线存储缺失或不完整时，若同名CSV存在则先由CSV重建
+    """
+    path = os.path.join(store_dir, name)
+    try:
+        with open(os.path.join(path, "meta.json"), 'r', encoding='utf-8') as f:
+            rows = json.load(f)["rows"]
+        columns = {field: np.load(os.path.join(path, f"{field}.npy"),
+                                  mmap_mode='r' if mmap else None) for field in schema}
+        if all(len(data) == rows for data in columns.values()):
+            return columns
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    if schema is not COLUMNS or not os.path.exists(f"{name}.csv"):
+        raise FileNotFoundError(f"未找到 {name} 的列式存储或CSV文件")
+    build_from_csv(f"{name}.csv", store_dir)
+    return load_bars(name, store_dir, mmap, schema)
+
+
+def rebuild_all(pattern="*_S[HZ].csv", store_dir=STORE_DIR):
+    """
+    由当前目录下所有证券CSV重建列式存储
+    """
+    for filename in sorted(glob.glob(pattern)):
+        rows = build_from_csv(filename, store_dir)
+        print(f"{filename} -> {os.path.join(store_dir, store_name(filename))}（{rows} 行）")
+
+
+if __name__ == "__main__":
+    rebuild_all(*sys.argv[1:2])
@@ -0,0 +1,57 @@
+from bar_store import BarStore
+
+
+class BatchCSVWriter:
+    """
+    批量CSV写入器
+
+    每个输出文件对应一个 BarStore，行先按交易日期 upsert 到内存缓冲区，
+    达到 batch_size 或 flush()/close() 时一次写出。写入时先写同目录临时
+    文件并 fsync，再用 os.replace 原子替换，进程被杀时原文件保持完整。
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.stores = {}
+        # 本次写入过数据的文件，供调用方同步更新列式存储
+        self.flushed = set()
+
+    def store(self, filename, header):
+        """
+        获取（或打开）指定文件的存储，可用于 O(1) 判断某日是否已有数据
+        """
+        store = self.stores.get(filename)
+        if store is None:
+            store = BarStore(filename, header)
+            self.stores[filename] = store
+        return store
+
+    def write(self, filename, header, row):
+        """
+        缓存一行，同一交易日期的旧行会被替换；文件不存在时首次写入加上表头
+        """
+        store = self.store(filename, header)
+        store.upsert(row)
+        if len(store) >= self.batch_size:
+            self.flush(filename)
+
+    def flush(self, filename=None):
+        """
+        写出指定文件（默认全部文件）的缓存行
+        """
+        filenames = [filename] if filename is not None else list(self.stores)
+        for name in filenames:
+            count = self.stores[name].flush()
+            if count:
+                self.flushed.add(name)
+                print(f"数据已保存到 {name}（{count} 行）")
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 出错时也写出已获取的数据
+        self.close()
@@ -1,23 +1,21 @@
-import akshare as ak
-import pandas as pd
+import datetime
+from trade_calendar import get_calendar
 
-# 获取所有历史交易日数据（数据来自新浪）
-# 该接口返回所有有记录的交易日列表
-trade_cal_df = ak.tool_trade_date_hist_sina()
-
-# 转换日期列为 datetime 格式
-trade_cal_df["trade_date"] = pd.to_datetime(trade_cal_df["trade_date"]).dt.date
+# 交易日历读取本地缓存（trade_calendar.bin），缓存缺失或过期时才通过 akshare 下载（数据来自新浪）
+start_date = datetime.date(2025, 1, 1)
+end_date = datetime.date(2025, 12, 31)
+calendar = get_calendar(end_date)
 
 # 筛选 2025 年的交易日
-# 注意：只有当交易所公布了2025年安排且接口更新后，此处才能查到2025年的数据
-start_date = pd.to_datetime("2025-01-01").date()
-end_date = pd.to_datetime("2025-12-31").date()
-
-calendar_2025 = trade_cal_df[
-    (trade_cal_df["trade_date"] >= start_date) & 
-    (trade_cal_df["trade_date"] <= end_date)
-]
+# 注意：只有当交易所公布了2025年安排且日历更新后，才能得到准确的2025年数据，
+# 日历未覆盖的日期按工作日处理
+calendar_2025 = calendar.trading_days(start_date, end_date)
 
 # 输出结果
 print(f"2025年A股全年交易日天数为: {len(calendar_2025)}")
-print(calendar_2025)
\ No newline at end of file
+if not calendar.last:
+    print("注意: 没有可用的交易日历，全部按工作日计算")
+elif calendar.last < end_date.year * 10000 + end_date.month * 100 + end_date.day:
+    print(f"注意: 交易日历只覆盖到 {calendar.last}，之后的日期按工作日计算")
+for day in calendar_2025:
+    print(day.isoformat())
@@ -0,0 +1,113 @@
+import csv
+import numpy as np
+from index_groups import WAN_PER_BILLION, load_config, load_group_totals
+
+# 输出表头（金额单位均为万元）
+HEADER = ["交易日期", "总成交额(万元)", "基准(万元)", "超额流入(万元)", "累计流入(万元)"]
+
+
+def output_file(group_name):
+    return f"{group_name}超额流入.csv"
+
+
+def compute_baseline(dates, total, start, end, fallback=None):
+    """
+    基准期内的日均成交额（万元）
+
+    存储的历史覆盖不到基准期时，使用配置中的默认基准（十亿元）。
+    """
+    mask = (dates >= start) & (dates <= end) & ~np.isnan(total)
+    if mask.any():
+        return float(total[mask].mean())
+    if fallback is None:
+        raise ValueError(f"基准期 {start}-{end} 内没有数据，且未配置默认基准")
+    return fallback * WAN_PER_BILLION
+
+
+def excess_inflow(total, baseline, excess_ratio=0.2, start_cumulative=0.0):
+    """
+    瑞银异常成交量法：单日成交额超过基准 (1+excess_ratio) 倍的部分记为流入
+
+    返回 (每日流入, 累计流入)；无数据的日期流入为 0
+    """
+    daily = np.maximum(np.nan_to_num(total) - baseline * (1 + excess_ratio), 0.0)
+    return daily, start_cumulative + np.cumsum(daily)
+
+
+def read_rows(filename):
+    """
+    读取已有输出的数据行（不含表头），文件不存在时返回空列表
+    """
+    try:
+        with open(filename, 'r', newline='', encoding='utf-8') as f:
+            return list(csv.reader(f))[1:]
+    except FileNotFoundError:
+        return []
+
+
+def first_changed(rows, dates, total):
+    """
+    已写出的行与重新汇总的结果第一次不一致的位置；全部一致时返回已写出的行数
+
+    补抓历史数据后，已写出日期的总成交额会变化，需要从该日期起重新计算累计流入。
+    """
+    for i, row in enumerate(rows):
+        if i >= len(dates) or int(row[0]) != dates[i] or row[1] != f"{total[i]:.2f}":
+            return i
+    return len(rows)
+
+
+def update_all(config=None, store_dir=None):
+    """
+    计算所有分组的每日和累计超额流入，并增量写入 {分组}超额流入.csv
+
+    基准期内的数据每次都重新计算基准；基准未变且已写出的总成交额都未变化时，
+    只追加上次之后的新交易日；已写出日期的总成交额有变化（补抓了历史数据）时，
+    保留变化日期之前的行，从该日期起重新计算并重写文件；基准变化（例如修改了
+    基准期）时重写整个文件。
+    """
+    config = config or load_config()
+    groups = config["groups"]
+    start, end = config["baseline"]["start"], config["baseline"]["end"]
+    ratio = config.get("excess_ratio", 0.2)
+    kwargs = {} if store_dir is None else {"store_dir": store_dir}
+
+    dates, totals = load_group_totals(groups, **kwargs)
+    results = {}
+    for name, group in groups.items():
+        total = totals[name]
+        baseline = compute_baseline(dates, total, start, end, group.get("fallback_baseline"))
+        keep = ~np.isnan(total)
+        valid_dates, valid_total = dates[keep], total[keep]
+
+        filename = output_file(name)
+        rows = read_rows(filename)
+        if rows and np.isclose(float(rows[-1][2]), round(baseline, 2)):
+            changed = first_changed(rows, valid_dates, valid_total)
+        else:
+            changed = 0
+        kept = rows[:changed]
+        cumulative_start = float(kept[-1][4]) if kept else 0.0
+
+        new_dates, new_total = valid_dates[changed:], valid_total[changed:]
+        daily, cumulative = excess_inflow(new_total, baseline, ratio, cumulative_start)
+
+        mode = 'a' if rows and changed == len(rows) else 'w'
+        with open(filename, mode, newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if mode == 'w':
+                writer.writerow(HEADER)
+                writer.writerows(kept)
+            writer.writerows([str(d), f"{t:.2f}", f"{baseline:.2f}", f"{v:.2f}", f"{c:.2f}"]
+                             for d, t, v, c in zip(new_dates, new_total, daily, cumulative))
+
+        total_inflow = cumulative[-1] if len(cumulative) else cumulative_start
+        action = "新增" if mode == 'a' or not rows else "重算"
+        print(f"{name}: 基准 {baseline / WAN_PER_BILLION:.2f} 十亿元，{action} {len(new_dates)} 天，"
+              f"累计流入 {total_inflow / WAN_PER_BILLION:.2f} 十亿元 -> {filename}")
+        results[name] = (new_dates, daily, cumulative)
+    return results
+
+
+if __name__ == "__main__":
+    update_all()
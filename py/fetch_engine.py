@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TokenBucket:
+    """
+    令牌桶限流器：平均每秒发放 rate 个令牌，最多积攒 capacity 个
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        取走一个令牌，令牌不足时阻塞等待
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# 每个交易所共用一个限流器，同一进程内多次调用也不会突破限速
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(exchange, rate, capacity=1):
+    """
+    获取（或创建）指定交易所的限流器，rate/capacity 变化时重新创建
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(exchange)
+        if bucket is None or bucket.rate != rate or bucket.capacity != capacity:
+            bucket = TokenBucket(rate, capacity)
+            _buckets[exchange] = bucket
+        return bucket
+
+
+def resume_jobs(state, codes, dates, store_of, skip_existing=True):
+    """
+    把本次请求的 (代码, 日期) 任务并入持久化任务队列，返回需要执行的任务
+
+    state: JobState，包含之前运行中断或失败留下的任务
+    store_of: store_of(code) -> 该代码的 BarStore
+    skip_existing: 存储中已有完整数据的任务直接标记完成，不发请求
+    """
+    requested = {(code, date_str) for code in codes for date_str in dates}
+    for code, date_str in requested:
+        state.add(code, date_str, reset=not skip_existing)
+
+    def is_saved(code, date_str):
+        return store_of(code).status(date_str) is not None
+
+    jobs = []
+    for code, date_str in state.resumable(is_saved=is_saved):
+        if skip_existing and store_of(code).has(date_str):
+            state.mark(code, date_str, True)
+        else:
+            jobs.append((code, date_str))
+
+    resumed = len([job for job in jobs if job not in requested])
+    print(f"待执行任务 {len(jobs)} 个，其中 {resumed} 个来自之前未完成或失败的运行")
+    return jobs
+
+
+def run_jobs(jobs, fetch, save, bucket, max_workers=4):
+    """
+    并发执行 (代码, 日期) 任务
+
+    jobs: (code, date_str) 列表
+    fetch: fetch(code, date_str) -> 数据，返回 None 表示请求失败
+    save: save(code, date_str, data)，data 为 None 时写入失败行
+    bucket: 限流器，每次请求前取一个令牌
+
+    网络请求在线程池中并发执行，结果按任务顺序在调用线程中保存，
+    因此 CSV 的行顺序与串行执行时一致。返回 (成功次数, 失败次数)。
+    """
+    def worker(code, date_str):
+        bucket.acquire()
+        print(f"正在获取代码 {code} 日期 {date_str} 的数据...")
+        try:
+            return fetch(code, date_str)
+        except Exception as e:
+            # 如果请求函数抛出异常，表示请求失败
+            print(f"代码 {code} 日期 {date_str} 请求异常: {e}")
+            return None
+
+    success_count = 0
+    fail_count = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(worker, code, date_str) for code, date_str in jobs]
+        for (code, date_str), future in zip(jobs, futures):
+            data = future.result()
+            save(code, date_str, data)
+            if data is None:
+                fail_count += 1
+                print(f"代码 {code} 日期 {date_str} 请求失败")
+            else:
+                success_count += 1
+                print(f"代码 {code} 日期 {date_str} 请求成功")
+
+    return success_count, fail_count
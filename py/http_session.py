@@ -0,0 +1,70 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 默认连接池大小（每个交易所保持的长连接数，应不小于抓取线程数）
+POOL_SIZE = 8
+
+# 统一的重试/退避策略：最多重试3次，退避 1, 2, 4 秒
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 1.0
+STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+# 每个交易所一个长连接会话
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def build_session(pool_size=POOL_SIZE, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    创建带连接池和重试策略的会话
+    """
+    session = requests.Session()
+    session.trust_env = False
+
+    retry = Retry(total=max_retries, connect=max_retries, read=max_retries,
+                  status=max_retries, backoff_factor=backoff_factor,
+                  status_forcelist=STATUS_FORCELIST, allowed_methods=frozenset(["GET"]))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                          max_retries=retry, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def configure_session(exchange, pool_size=POOL_SIZE, max_retries=MAX_RETRIES,
+                      backoff_factor=BACKOFF_FACTOR):
+    """
+    按给定参数重建指定交易所的会话，旧会话的连接会被关闭
+    """
+    session = build_session(pool_size, max_retries, backoff_factor)
+    with _sessions_lock:
+        old = _sessions.get(exchange)
+        _sessions[exchange] = session
+    if old is not None:
+        old.close()
+    return session
+
+
+def get_session(exchange):
+    """
+    获取指定交易所的共享会话，首次调用时按默认参数创建
+    """
+    with _sessions_lock:
+        session = _sessions.get(exchange)
+        if session is None:
+            session = build_session()
+            _sessions[exchange] = session
+        return session
+
+
+def close_sessions():
+    """
+    关闭所有交易所的会话
+    """
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
@@ -0,0 +1,60 @@
+import json
+import os
+import numpy as np
+from columnar_store import COLUMNS, STORE_DIR, load_bars
+from mad_engine import align_series
+
+# 指数分组配置：分组 -> 成分ETF（存储名）、汇总输出文件、基准期之外的默认基准
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_groups.json")
+
+# 成交额单位换算：万元 -> 十亿元
+WAN_PER_BILLION = 100000
+
+
+def load_config(filename=CONFIG_FILE):
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_group_totals(groups, column="amount", store_dir=STORE_DIR, since=None,
+                      suffix="", schema=COLUMNS):
+    """
+    一次性计算所有分组每日的成分ETF合计
+
+    groups: {分组名: {"codes": [...], ...}}
+    since: 只返回晚于该日期（YYYYMMDD）的数据
+    suffix, schema: 读取其他列式数据（如份额存储 510300_SH_shares）时的存储名后缀和列定义
+    每只ETF的列只读取一次（即使属于多个分组），按日期外连接成矩阵后，
+    用成员矩阵求和。返回 (日期数组, {分组名: 合计数组})；
+    某日所有成分都无数据时合计为 NaN。
+    """
+    codes = list(dict.fromkeys(code for group in groups.values() for code in group["codes"]))
+    names, series = [], []
+    for code in codes:
+        try:
+            bars = load_bars(f"{code}{suffix}", store_dir, schema=schema)
+        except FileNotFoundError:
+            print(f"未找到 {code} 的数据，跳过")
+            continue
+        dates = np.asarray(bars["date"])
+        values = np.asarray(bars[column])
+        if since is not None:
+            mask = dates > since
+            dates, values = dates[mask], values[mask]
+        names.append(code)
+        series.append((dates, values))
+
+    if not any(len(dates) for dates, _ in series):
+        return np.array([], dtype=np.int32), {name: np.array([]) for name in groups}
+
+    dates, matrix = align_series(series)
+    present = ~np.isnan(matrix)
+    filled = np.where(present, matrix, 0.0)
+    totals = {}
+    for name, group in groups.items():
+        rows = [names.index(code) for code in group["codes"] if code in names]
+        # 按配置顺序逐行累加，与原来逐文件累加的结果一致
+        total = np.add.reduce(filled[rows], axis=0) if rows else np.zeros(len(dates))
+        total[~present[rows].any(axis=0)] = np.nan
+        totals[name] = total
+    return dates, totals
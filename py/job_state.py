@@ -0,0 +1,100 @@
+import json
+import os
+
+# 同一任务最多尝试的次数（跨多次运行累计），超过后不再自动重试
+MAX_ATTEMPTS = 5
+
+
+class JobState:
+    """
+    持久化的 (代码, 日期) 任务队列，记录每个任务的状态：
+    pending（待执行）、done（已完成）、failed（失败，下次运行自动重试）
+
+    中断后重新运行时只会执行未完成或失败的任务。状态文件每 save_every
+    次更新写一次，并在运行结束时写出；状态可能落后于CSV，但不会超前，
+    因为已完成的任务还会再用存储索引确认一次。
+    """
+
+    def __init__(self, filename, save_every=20):
+        self.filename = filename
+        self.save_every = save_every
+        self.unsaved = 0
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                self.jobs = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.jobs = {}
+
+    @staticmethod
+    def _key(code, date_str):
+        return f"{code}|{date_str}"
+
+    def add(self, code, date_str, reset=False):
+        """
+        加入本次明确请求的任务：未完成的任务重新计算尝试次数（自动续跑才受
+        MAX_ATTEMPTS 限制），已完成的任务保持原状态；reset 为 True 时一律重置为待执行
+        """
+        key = self._key(code, date_str)
+        job = self.jobs.get(key)
+        if reset or job is None or job["status"] != "done":
+            self.jobs[key] = {"status": "pending", "attempts": 0}
+
+    def resumable(self, is_saved=None):
+        """
+        返回需要执行的任务（未完成或失败且未超过重试次数），按代码、日期排序
+
+        is_saved: is_saved(code, date_str) 判断结果是否已写入存储；标记为
+                  done 但结果未写出（进程在写出前被杀）的任务会重新执行
+        """
+        jobs = []
+        for key, job in self.jobs.items():
+            code, date_str = key.split("|")
+            if job["status"] == "done":
+                if is_saved is not None and not is_saved(code, date_str):
+                    jobs.append((code, date_str))
+            elif job["attempts"] < MAX_ATTEMPTS:
+                jobs.append((code, date_str))
+        return sorted(jobs)
+
+    def mark(self, code, date_str, ok):
+        """
+        记录任务结果，每次记录计入一次尝试
+        """
+        job = self.jobs.setdefault(self._key(code, date_str), {"status": "pending", "attempts": 0})
+        job["attempts"] += 1
+        job["status"] = "done" if ok else "failed"
+        self.unsaved += 1
+        if self.unsaved >= self.save_every:
+            self.save()
+
+    def counts(self):
+        """
+        各状态的任务数量
+        """
+        counts = {"pending": 0, "done": 0, "failed": 0}
+        for job in self.jobs.values():
+            counts[job["status"]] += 1
+        return counts
+
+    def prune(self):
+        """
+        运行结束后移除已完成的任务和已用尽重试次数的任务，只保留还会自动重试的任务
+
+        用尽重试次数的日期在CSV中保留失败行，之后可通过明确请求该日期重新抓取
+        """
+        exhausted = [key for key, job in self.jobs.items()
+                     if job["status"] != "done" and job["attempts"] >= MAX_ATTEMPTS]
+        for key in exhausted:
+            print(f"任务 {key} 已失败 {MAX_ATTEMPTS} 次，不再自动重试")
+        self.jobs = {key: job for key, job in self.jobs.items()
+                     if job["status"] != "done" and job["attempts"] < MAX_ATTEMPTS}
+
+    def save(self):
+        """
+        原子写出状态文件
+        """
+        tmp = f"{self.filename}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.jobs, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp, self.filename)
+        self.unsaved = 0
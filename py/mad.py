@@ -1,230 +1,317 @@
-import pandas as pd
 import numpy as np
 from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-import matplotlib.ticker as ticker
-import os
 import sys
+# 滑动滞后窗口MAD方法（增量实现，结果与逐窗 np.median 计算完全一致）
+from mad_engine import lagged_rolling_mad
 
-# 获取当前目录下的TTF字体文件
-current_dir = os.path.dirname(os.path.abspath(__file__))
-ttf_files = [f for f in os.listdir(current_dir) if f.endswith('.ttf')]
-
-if ttf_files:
-    # 添加字体到Matplotlib字体管理器
-    font_path = os.path.join(current_dir, ttf_files[0])
-    fm.fontManager.addfont(font_path)
-    
-    # 获取字体名称
-    font_prop = fm.FontProperties(fname=font_path)
-    font_name = font_prop.get_name()
-    
-    # 设置全局字体
-    plt.rcParams['font.family'] = font_name
-    plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
-
-# 设置中文字体支持SimHei
-# plt.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
-# plt.rcParams['axes.unicode_minus'] = False    # 解决负号显示问题
-
-# 1. 读取历史窗口数据
-try:
-    hist_df = pd.read_csv('20天窗口数据.csv')
-    print(f"历史窗口数据形状: {hist_df.shape}")
-    print("历史窗口数据前5行:")
-    print(hist_df.head())
-except FileNotFoundError:
-    print("错误: 未找到'20天窗口数据.csv'文件")
-    sys.exit(1)
-
-# 2. 读取新数据
-try:
-    new_df = pd.read_csv('沪深300ETF.csv')
-    print(f"\n新数据形状: {new_df.shape}")
-    print("新数据前5行:")
-    print(new_df.head())
-except FileNotFoundError:
-    print("错误: 未找到'沪深300ETF.csv'文件")
-    sys.exit(1)
-
-# 3. 合并数据（历史数据在前，新数据在后）
-df = pd.concat([hist_df, new_df], ignore_index=True)
-print(f"\n合并后总数据形状: {df.shape}")
-
-# 4. 检查总数据量是否大于20
-if len(df) <= 20:
-    print(f"错误: 合并后总数据量({len(df)})不足20天，无法进行计算")
-    print("程序将关闭...")
-    sys.exit(1)
-else:
-    print(f"数据量检查通过: 总数据{len(df)}天 > 20天窗口")
-
-# 5. 实现滑动滞后窗口MAD方法
-def lagged_rolling_mad(data, k=20, threshold=2.0):
+# pandas、matplotlib 只在用到时导入，字体由 render.setup_font 注册（结果跨运行缓存）
+
+# 默认输入文件
+HISTORY_FILE = '20天窗口数据.csv'
+DATA_FILE = '沪深300ETF.csv'
+
+# 图表最大宽度（英寸）；原图表每点 0.1 英寸，超过该宽度（约240点）时改用长历史模式
+MAX_FIG_WIDTH = 24
+
+# 长历史模式：Z分数折线抽稀到不超过该点数
+LONG_HISTORY_POINTS = 2000
+
+# 长历史模式下只标注 |Z| 最大的若干个异常值
+TOP_N_LABELS = 10
+
+
+def load_data(history_file=HISTORY_FILE, data_file=DATA_FILE):
+    """
+    读取历史窗口数据和新数据，缺少文件时退出
+    """
+    import pandas as pd
+    # 1. 读取历史窗口数据
+    try:
+        hist_df = pd.read_csv(history_file)
+        print(f"历史窗口数据形状: {hist_df.shape}")
+        print("历史窗口数据前5行:")
+        print(hist_df.head())
+    except FileNotFoundError:
+        print(f"错误: 未找到'{history_file}'文件")
+        sys.exit(1)
+
+    # 2. 读取新数据
+    try:
+        new_df = pd.read_csv(data_file)
+        print(f"\n新数据形状: {new_df.shape}")
+        print("新数据前5行:")
+        print(new_df.head())
+    except FileNotFoundError:
+        print(f"错误: 未找到'{data_file}'文件")
+        sys.exit(1)
+
+    return hist_df, new_df
+
+
+def detect(hist_df, new_df):
+    """
+    合并历史与新数据并做滑动滞后窗口MAD检测，返回 (合并后的DataFrame, 新数据开始索引)
+    """
+    import pandas as pd
+    # 3. 合并数据（历史数据在前，新数据在后）
+    df = pd.concat([hist_df, new_df], ignore_index=True)
+    print(f"\n合并后总数据形状: {df.shape}")
+
+    # 4. 检查总数据量是否大于20
+    if len(df) <= 20:
+        print(f"错误: 合并后总数据量({len(df)})不足20天，无法进行计算")
+        print("程序将关闭...")
+        sys.exit(1)
+    else:
+        print(f"数据量检查通过: 总数据{len(df)}天 > 20天窗口")
+
+    # 5. 应用到数据
+    data = df['总成交额(万元)'].values
+    is_outlier, z_scores = lagged_rolling_mad(data, k=20, threshold=2.0)
+
+    # 6. 添加结果到DataFrame
+    df['lag_mad_z_score'] = z_scores
+    df['is_outlier'] = is_outlier
+
+    # 7. 只显示新数据部分的异常值统计
+    new_data_start_idx = len(hist_df)
+    new_data_is_outlier = is_outlier[new_data_start_idx:]
+    outlier_count = np.sum(new_data_is_outlier)
+    new_data_count = len(new_df)
+
+    print(f"\n=== 新数据部分异常检测结果 ===")
+    print(f"新数据天数: {new_data_count}")
+    print(f"检测到的异常值数量: {outlier_count}")
+    print(f"异常值占比: {outlier_count/new_data_count*100:.2f}%")
+
+    # 8. 显示异常值详情（只显示新数据部分）
+    new_data_outliers = df.iloc[new_data_start_idx:][df.iloc[new_data_start_idx:]['is_outlier']]
+    print("\n异常值详情:")
+    if len(new_data_outliers) > 0:
+        print(new_data_outliers[['交易日期', '总成交额(万元)', 'lag_mad_z_score']])
+    else:
+        print("无异常值")
+
+    return df, new_data_start_idx
+
+
+def default_filename():
+    # 使用系统时间命名图片
+    current_time = datetime.now().strftime("%y%m%d")
+    return f"{current_time}_沪深300ETF滑动滞后窗口MAD异常检测.png"
+
+
+def plot(df, new_data_start_idx, filename=None, long_history=None):
+    """
+    只对新数据部分绘制修正Z分数图，返回图片文件名
+
+    long_history: 是否使用长历史模式，默认在原图表宽度会超过 MAX_FIG_WIDTH 时启用
+    """
+    new_df_processed = df.iloc[new_data_start_idx:].copy()
+    if long_history is None:
+        long_history = len(new_df_processed) * 0.1 > MAX_FIG_WIDTH
+    if long_history:
+        return plot_long(new_df_processed, filename)
+
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
+    from render import setup_font
+    setup_font()
+
+    # 9. 只对新数据部分进行可视化
+
+    # 转换日期格式
+    new_df_processed['日期'] = pd.to_datetime(new_df_processed['交易日期'], format='%Y%m%d')
+    # 创建日期标签（月-日格式）
+    new_df_processed['日期标签'] = new_df_processed['日期'].dt.strftime('%m-%d')
+
+    # 获取异常值数据
+    outlier_dates = new_df_processed[new_df_processed['is_outlier']]['日期']
+    outlier_z_scores = new_df_processed[new_df_processed['is_outlier']]['lag_mad_z_score']
+    outlier_labels = new_df_processed[new_df_processed['is_outlier']]['日期标签']
+
+    # 创建紧凑的图表
+    plt.figure(figsize=(max(8, len(new_df_processed)*0.1), 6))
+
+    # 1. 开启压缩
+    plt.yscale('symlog', linthresh=10)
+
+    # 2. 找回自动生成的“普通数字”刻度
+    ax = plt.gca()
+
+    # 让系统自动找刻度，但不要只找 10 的倍数
+    ax.yaxis.set_major_locator(ticker.AutoLocator()) 
+
+    # 强制把标签转回普通的数字（例如 10 而不是 10^1）
+    ax.yaxis.set_major_formatter(ticker.ScalarFormatter())
+
+    # 绘制修正Z分数
+    plt.plot(new_df_processed['日期'], new_df_processed['lag_mad_z_score'], 
+             color='green', linewidth=1, label='修正Z分数')
+    plt.axhline(y=2.0, color='red', linestyle='--', alpha=0.7, label='阈值 (+2.0)')
+    plt.axhspan(1.75,2.0, color='orange', alpha=0.7, label='预警区间 (+1.75)')
+    plt.axhline(y=-2.0, color='red', linestyle='--', alpha=0.7, label='阈值 (-2.0)')
+    plt.axhline(y=0, color='black', linestyle='-', alpha=0.5, linewidth=0.5)
+
+    # 标记异常值点
+    if len(outlier_dates) > 0:
+        plt.scatter(outlier_dates, outlier_z_scores, 
+                   color='red', s=50, label='异常值', zorder=5)
+
+    # 在异常值点旁边添加日期标签
+    if len(outlier_dates) > 0:
+        for date, z_score, label in zip(outlier_dates, outlier_z_scores, outlier_labels):
+            # 添加标注
+            plt.annotate(label, 
+                         xy=(date, z_score),
+                         xytext=(0, 10),  # 偏移量
+                         textcoords='offset points',
+                         fontsize=8,
+                         ha='center',
+                         bbox=dict(boxstyle='round,pad=0.2', facecolor='yellow', alpha=0.7, edgecolor='red'),
+                         arrowprops=dict(arrowstyle='->', color='red', lw=1))
+
+    plt.title('沪深300ETF滑动滞后窗口MAD异常检测 - 修正Z分数')
+    plt.xlabel('日期')
+    plt.ylabel('修正Z分数')
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+
+    # 格式化x轴日期
+    plt.xticks(rotation=45)
+
+    # 调整布局
+    plt.tight_layout()
+
+    # 使用系统时间命名并保存图片
+    filename = filename or default_filename()
+    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    print(f"\n图表已保存为: {filename}")
+
+    # 显示图表
+    # plt.show()
+
+    plt.close()
+    return filename
+
+
+def plot_long(part, filename=None, max_points=LONG_HISTORY_POINTS, top_n=TOP_N_LABELS):
     """
-    滑动滞后窗口MAD异常检测
-    
-    参数:
-    data: 时间序列数据
-    k: 窗口大小
-    threshold: 异常阈值
-    
-    返回:
-    is_outlier: 异常值布尔数组
-    z_scores: 各点的修正Z分数
+    长历史模式：绘图耗时与序列长度基本无关
+
+    Z分数折线做最大/最小值抽稀（尖峰保留），异常值用一次 scatter 绘制，
+    只标注 |Z| 最大的 top_n 个异常值，图表宽度不超过 MAX_FIG_WIDTH
     """
-    n = len(data)
-    z_scores = np.zeros(n)
-    is_outlier = np.zeros(n, dtype=bool)
-    
-    for t in range(k, n):
-        # 获取滞后窗口（不包含当前点）
-        window = data[t-k:t]
-        
-        # 计算窗口中位数
-        median_val = np.median(window)
-        
-        # 计算MAD
-        mad_val = np.median(np.abs(window - median_val))
-        
-        # 处理MAD=0的情况
-        if mad_val == 0:
-            mad_val = 1e-8
-        
-        # 计算修正Z分数
-        z_score = 0.6745 * (data[t] - median_val) / mad_val
-        z_scores[t] = z_score
-        
-        # 判断异常
-        if abs(z_score) > threshold:
-            is_outlier[t] = True
-    
-    return is_outlier, z_scores
-
-# 6. 应用到数据
-data = df['总成交额(万元)'].values
-is_outlier, z_scores = lagged_rolling_mad(data, k=20, threshold=2.0)
-
-# 7. 添加结果到DataFrame
-df['lag_mad_z_score'] = z_scores
-df['is_outlier'] = is_outlier
-
-# 8. 只显示新数据部分的异常值统计
-new_data_start_idx = len(hist_df)
-new_data_is_outlier = is_outlier[new_data_start_idx:]
-outlier_count = np.sum(new_data_is_outlier)
-new_data_count = len(new_df)
-
-print(f"\n=== 新数据部分异常检测结果 ===")
-print(f"新数据天数: {new_data_count}")
-print(f"检测到的异常值数量: {outlier_count}")
-print(f"异常值占比: {outlier_count/new_data_count*100:.2f}%")
-
-# 9. 显示异常值详情（只显示新数据部分）
-new_data_outliers = df.iloc[new_data_start_idx:][df.iloc[new_data_start_idx:]['is_outlier']]
-print("\n异常值详情:")
-if len(new_data_outliers) > 0:
-    print(new_data_outliers[['交易日期', '总成交额(万元)', 'lag_mad_z_score']])
-else:
-    print("无异常值")
-
-# 10. 只对新数据部分进行可视化
-new_df_processed = df.iloc[new_data_start_idx:].copy()
-
-# 转换日期格式
-new_df_processed['日期'] = pd.to_datetime(new_df_processed['交易日期'], format='%Y%m%d')
-# 创建日期标签（月-日格式）
-new_df_processed['日期标签'] = new_df_processed['日期'].dt.strftime('%m-%d')
-
-# 获取异常值数据
-outlier_dates = new_df_processed[new_df_processed['is_outlier']]['日期']
-outlier_z_scores = new_df_processed[new_df_processed['is_outlier']]['lag_mad_z_score']
-outlier_labels = new_df_processed[new_df_processed['is_outlier']]['日期标签']
-
-# 创建紧凑的图表
-plt.figure(figsize=(max(8, len(new_df_processed)*0.1), 6))
-
-# 1. 开启压缩
-plt.yscale('symlog', linthresh=10)
-
-# 2. 找回自动生成的“普通数字”刻度
-ax = plt.gca()
-
-# 让系统自动找刻度，但不要只找 10 的倍数
-ax.yaxis.set_major_locator(ticker.AutoLocator()) 
-
-# 强制把标签转回普通的数字（例如 10 而不是 10^1）
-ax.yaxis.set_major_formatter(ticker.ScalarFormatter())
-
-# 绘制修正Z分数
-plt.plot(new_df_processed['日期'], new_df_processed['lag_mad_z_score'], 
-         color='green', linewidth=1, label='修正Z分数')
-plt.axhline(y=2.0, color='red', linestyle='--', alpha=0.7, label='阈值 (+2.0)')
-plt.axhspan(1.75,2.0, color='orange', alpha=0.7, label='预警区间 (+1.75)')
-plt.axhline(y=-2.0, color='red', linestyle='--', alpha=0.7, label='阈值 (-2.0)')
-plt.axhline(y=0, color='black', linestyle='-', alpha=0.5, linewidth=0.5)
-
-# 标记异常值点
-if len(outlier_dates) > 0:
-    plt.scatter(outlier_dates, outlier_z_scores, 
-               color='red', s=50, label='异常值', zorder=5)
-
-# 在异常值点旁边添加日期标签
-if len(outlier_dates) > 0:
-    for date, z_score, label in zip(outlier_dates, outlier_z_scores, outlier_labels):
-        # 添加标注
-        plt.annotate(label, 
-                     xy=(date, z_score),
-                     xytext=(0, 10),  # 偏移量
-                     textcoords='offset points',
-                     fontsize=8,
-                     ha='center',
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
+    from render import minmax_decimate, setup_font
+    setup_font()
+
+    raw = part['交易日期'].to_numpy(dtype=np.int64)
+    months = (raw // 10000 - 1970) * 12 + raw // 100 % 100 - 1
+    dates = months.astype('datetime64[M]').astype('datetime64[D]') + (raw % 100 - 1)
+    z_scores = part['lag_mad_z_score'].to_numpy(dtype=np.float64)
+    is_outlier = part['is_outlier'].to_numpy(dtype=bool)
+
+    idx = minmax_decimate(z_scores, max_points)
+    plt.figure(figsize=(min(MAX_FIG_WIDTH, max(8, len(idx) * 0.1)), 6))
+    plt.yscale('symlog', linthresh=10)
+    ax = plt.gca()
+    ax.yaxis.set_major_locator(ticker.AutoLocator())
+    ax.yaxis.set_major_formatter(ticker.ScalarFormatter())
+
+    plt.plot(dates[idx], z_scores[idx], color='green', linewidth=1,
+             label=f'修正Z分数（{len(z_scores)}点抽稀为{len(idx)}点）' if len(idx) < len(z_scores) else '修正Z分数')
+    plt.axhline(y=2.0, color='red', linestyle='--', alpha=0.7, label='阈值 (+2.0)')
+    plt.axhspan(1.75, 2.0, color='orange', alpha=0.7, label='预警区间 (+1.75)')
+    plt.axhline(y=-2.0, color='red', linestyle='--', alpha=0.7, label='阈值 (-2.0)')
+    plt.axhline(y=0, color='black', linestyle='-', alpha=0.5, linewidth=0.5)
+
+    # 全部异常值作为一个集合绘制
+    outliers = np.flatnonzero(is_outlier)
+    if len(outliers) > 0:
+        plt.scatter(dates[outliers], z_scores[outliers], color='red', s=12, label='异常值', zorder=5)
+
+    # 只标注 |Z| 最大的 top_n 个异常值
+    top = outliers[np.argsort(-np.abs(z_scores[outliers]), kind='stable')[:top_n]]
+    for i in top:
+        plt.annotate(str(dates[i]), xy=(dates[i], z_scores[i]), xytext=(0, 10),
+                     textcoords='offset points', fontsize=8, ha='center',
                      bbox=dict(boxstyle='round,pad=0.2', facecolor='yellow', alpha=0.7, edgecolor='red'),
                      arrowprops=dict(arrowstyle='->', color='red', lw=1))
 
-plt.title('沪深300ETF滑动滞后窗口MAD异常检测 - 修正Z分数')
-plt.xlabel('日期')
-plt.ylabel('修正Z分数')
-plt.legend()
-plt.grid(True, alpha=0.3)
-
-# 格式化x轴日期
-plt.xticks(rotation=45)
-
-# 调整布局
-plt.tight_layout()
-
-# 使用系统时间命名并保存图片
-current_time = datetime.now().strftime("%y%m%d")
-filename = f"{current_time}_沪深300ETF滑动滞后窗口MAD异常检测.png"
-plt.savefig(filename, dpi=300, bbox_inches='tight')
-print(f"\n图表已保存为: {filename}")
-
-# 显示图表
-# plt.show()
-
-# 11. 计算和显示关键信息
-print("\n" + "="*60)
-print("数据汇总信息")
-print("="*60)
-print(f"历史窗口数据天数: {len(hist_df)}")
-print(f"新数据天数: {len(new_df)}")
-print(f"总数据天数: {len(df)}")
-print(f"计算起始点: 第{20}天 (从历史数据开始)")
-print(f"新数据开始索引: {new_data_start_idx}")
-print(f"新数据第一个计算点: 新数据第1天")
-print(f"检测窗口大小: 20天")
-print(f"异常阈值: 2.0")
-
-# 12. 添加数据验证
-print("\n" + "="*60)
-print("数据验证")
-print("="*60)
-print(f"1. 历史数据最后5天:")
-print(hist_df.tail())
-print(f"\n2. 新数据前5天:")
-print(new_df.head())
-print(f"\n3. 合并后数据衔接验证:")
-print(f"  历史数据最后日期: {hist_df.iloc[-1]['交易日期']}")
-print(f"  新数据最早日期: {new_df.iloc[0]['交易日期']}")
\ No newline at end of file
+    title = '沪深300ETF滑动滞后窗口MAD异常检测 - 修正Z分数'
+    if len(outliers) > len(top):
+        title += f'（共{len(outliers)}个异常值，标注前{len(top)}个）'
+    plt.title(title)
+    plt.xlabel('日期')
+    plt.ylabel('修正Z分数')
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+    filename = filename or default_filename()
+    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    print(f"\n图表已保存为: {filename}")
+    plt.close()
+    return filename
+
+
+def plot_cached(df, new_data_start_idx, filename=None, long_history=None):
+    """
+    新数据部分的日期、Z分数和异常标记都与之前某次渲染相同时复用那张图片，否则重新绘制
+    """
+    from render_cache import cached_render, render_key
+    filename = filename or default_filename()
+    part = df.iloc[new_data_start_idx:]
+    dates = part['交易日期'].to_numpy(dtype=np.int64)
+    key = render_key("mad", dates, part['lag_mad_z_score'].to_numpy(dtype=np.float64),
+                     part['is_outlier'].to_numpy(dtype=bool),
+                     {"long_history": long_history, "points": LONG_HISTORY_POINTS, "top_n": TOP_N_LABELS,
+                      "width": MAX_FIG_WIDTH})
+    inputs = {"title": "沪深300ETF滑动滞后窗口MAD异常检测", "rows": len(dates),
+              "first": int(dates[0]) if len(dates) else None,
+              "last": int(dates[-1]) if len(dates) else None}
+    cached_render(key, filename, lambda: plot(df, new_data_start_idx, filename, long_history), inputs)
+    return filename
+
+
+def print_summary(hist_df, new_df, df, new_data_start_idx):
+    # 10. 计算和显示关键信息
+    print("\n" + "="*60)
+    print("数据汇总信息")
+    print("="*60)
+    print(f"历史窗口数据天数: {len(hist_df)}")
+    print(f"新数据天数: {len(new_df)}")
+    print(f"总数据天数: {len(df)}")
+    print(f"计算起始点: 第{20}天 (从历史数据开始)")
+    print(f"新数据开始索引: {new_data_start_idx}")
+    print(f"新数据第一个计算点: 新数据第1天")
+    print(f"检测窗口大小: 20天")
+    print(f"异常阈值: 2.0")
+
+    # 11. 添加数据验证
+    print("\n" + "="*60)
+    print("数据验证")
+    print("="*60)
+    print(f"1. 历史数据最后5天:")
+    print(hist_df.tail())
+    print(f"\n2. 新数据前5天:")
+    print(new_df.head())
+    print(f"\n3. 合并后数据衔接验证:")
+    print(f"  历史数据最后日期: {hist_df.iloc[-1]['交易日期']}")
+    print(f"  新数据最早日期: {new_df.iloc[0]['交易日期']}")
+
+
+def main(history_file=HISTORY_FILE, data_file=DATA_FILE, long_history=None):
+    hist_df, new_df = load_data(history_file, data_file)
+    df, new_data_start_idx = detect(hist_df, new_df)
+    plot_cached(df, new_data_start_idx, long_history=long_history)
+    print_summary(hist_df, new_df, df, new_data_start_idx)
+
+
+if __name__ == "__main__":
+    # --long：强制使用长历史模式
+    main(long_history=True if "--long" in sys.argv[1:] else None)
@@ -0,0 +1,225 @@
+import bisect
+import numpy as np
+
+# 修正Z分数系数（正态分布下 MAD 与标准差的换算）
+MAD_SCALE = 0.6745
+
+# MAD 为 0 时的替代值，避免除零
+MAD_EPSILON = 1e-8
+
+
+class SortedWindow:
+    """
+    升序维护的滑动窗口
+
+    加入/移除一个值为二分查找定位，中位数 O(1)；MAD 不展开偏差数组，
+    而是把中位数两侧的偏差看作两个有序序列，二分求第 k 小，O(log k)。
+    结果与 np.median 逐窗计算完全一致。
+    """
+
+    def __init__(self, values=()):
+        self.values = sorted(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        bisect.insort(self.values, value)
+
+    def remove(self, value):
+        del self.values[bisect.bisect_left(self.values, value)]
+
+    def median(self):
+        values = self.values
+        n = len(values)
+        half = n // 2
+        if n % 2:
+            return values[half]
+        return (values[half - 1] + values[half]) / 2
+
+    def _kth_deviation(self, k, median_val, split):
+        """
+        第 k 小（从0开始）的 |x - median|
+
+        左侧 values[:split] 的偏差 median - x 倒序递增，右侧 values[split:]
+        的偏差 x - median 正序递增，在两个有序序列上二分选择。
+        """
+        values = self.values
+        n_left = split
+        n_right = len(values) - split
+        take = k + 1
+
+        def left(i):
+            return median_val - values[split - 1 - i]
+
+        def right(j):
+            return values[split + j] - median_val
+
+        lo = max(0, take - n_right)
+        hi = min(take, n_left)
+        while lo < hi:
+            i = (lo + hi) // 2
+            j = take - i
+            if j > 0 and i < n_left and right(j - 1) > left(i):
+                lo = i + 1
+            else:
+                hi = i
+        i = lo
+        j = take - i
+        candidates = []
+        if i > 0:
+            candidates.append(left(i - 1))
+        if j > 0:
+            candidates.append(right(j - 1))
+        return max(candidates)
+
+    def mad(self, median_val):
+        """
+        窗口的中位数绝对偏差
+        """
+        n = len(self.values)
+        split = bisect.bisect_left(self.values, median_val)
+        half = n // 2
+        if n % 2:
+            return self._kth_deviation(half, median_val, split)
+        return (self._kth_deviation(half - 1, median_val, split)
+                + self._kth_deviation(half, median_val, split)) / 2
+
+
+def modified_z_score(value, median_val, mad_val):
+    """
+    修正Z分数，MAD 为 0 时按 1e-8 处理
+    """
+    if mad_val == 0:
+        mad_val = MAD_EPSILON
+    return MAD_SCALE * (value - median_val) / mad_val
+
+
+def lagged_rolling_mad_naive(data, k=20, threshold=2.0):
+    """
+    滑动滞后窗口MAD异常检测（逐窗调用 np.median 的原始实现，O(n·k log k)）
+
+    参数:
+    data: 时间序列数据
+    k: 窗口大小
+    threshold: 异常阈值
+
+    返回:
+    is_outlier: 异常值布尔数组
+    z_scores: 各点的修正Z分数
+    """
+    n = len(data)
+    z_scores = np.zeros(n)
+    is_outlier = np.zeros(n, dtype=bool)
+
+    for t in range(k, n):
+        # 获取滞后窗口（不包含当前点）
+        window = data[t-k:t]
+
+        # 计算窗口中位数
+        median_val = np.median(window)
+
+        # 计算MAD
+        mad_val = np.median(np.abs(window - median_val))
+
+        # 处理MAD=0的情况
+        if mad_val == 0:
+            mad_val = 1e-8
+
+        # 计算修正Z分数
+        z_score = 0.6745 * (data[t] - median_val) / mad_val
+        z_scores[t] = z_score
+
+        # 判断异常
+        if abs(z_score) > threshold:
+            is_outlier[t] = True
+
+    return is_outlier, z_scores
+
+
+def lagged_rolling_mad(data, k=20, threshold=2.0):
+    """
+    滑动滞后窗口MAD异常检测（增量实现，O(n log k)）
+
+    窗口每滑动一步只移除最旧值、加入最新值，中位数和MAD由有序窗口直接得出，
+    结果与 lagged_rolling_mad_naive 逐位相同。数据含 NaN 时退回原始实现。
+
+    返回:
+    is_outlier: 异常值布尔数组
+    z_scores: 各点的修正Z分数
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if np.isnan(data).any():
+        return lagged_rolling_mad_naive(data, k, threshold)
+
+    n = len(data)
+    z_scores = np.zeros(n)
+    is_outlier = np.zeros(n, dtype=bool)
+    if n <= k:
+        return is_outlier, z_scores
+
+    values = data.tolist()
+    window = SortedWindow(values[:k])
+    for t in range(k, n):
+        median_val = window.median()
+        z_score = modified_z_score(values[t], median_val, window.mad(median_val))
+        z_scores[t] = z_score
+        if abs(z_score) > threshold:
+            is_outlier[t] = True
+
+        # 滑动窗口：移出 t-k，加入 t
+        window.remove(values[t - k])
+        window.add(values[t])
+
+    return is_outlier, z_scores
+
+
+def batch_lagged_mad(series, ks=(20,), threshold=2.0, max_elements=4_000_000):
+    """
+    多条序列、多个窗口大小的向量化滑动滞后窗口MAD
+
+    series: 二维数组 (序列数, 天数)，缺失值为 NaN（含 NaN 的窗口结果为 NaN）
+    ks: 窗口大小列表
+    max_elements: 单次展开的窗口元素上限，按时间分块以控制内存
+
+    用 sliding_window_view 构造全部滞后窗口（零拷贝视图），一次性沿最后一维
+    求中位数和MAD。返回 {k: (is_outlier, z_scores)}，两者形状均与 series 相同；
+    每一行的结果与对该行单独调用 lagged_rolling_mad_naive 一致。
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    data = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    n_series, n = data.shape
+    results = {}
+    for k in ks:
+        z_scores = np.zeros((n_series, n))
+        if n > k:
+            # windows[:, i] 为第 k+i 天之前的 k 天（不含当天）
+            windows = sliding_window_view(data, k, axis=-1)[:, :-1]
+            step = max(1, max_elements // max(1, n_series * k))
+            for start in range(0, n - k, step):
+                block = windows[:, start:start + step]
+                median_val = np.median(block, axis=-1)
+                mad_val = np.median(np.abs(block - median_val[..., None]), axis=-1)
+                mad_val[mad_val == 0] = MAD_EPSILON
+                current = data[:, k + start:k + start + block.shape[1]]
+                z_scores[:, k + start:k + start + block.shape[1]] = \
+                    MAD_SCALE * (current - median_val) / mad_val
+        with np.errstate(invalid="ignore"):
+            is_outlier = np.abs(z_scores) > threshold
+        results[k] = (is_outlier, z_scores)
+    return results
+
+
+def align_series(series_list):
+    """
+    按日期外连接多条序列
+
+    series_list: [(dates, values), ...]，dates 为 YYYYMMDD 整数数组
+    返回 (全部日期, 二维数组)，某序列缺失的日期为 NaN
+    """
+    all_dates = np.unique(np.concatenate([np.asarray(dates) for dates, _ in series_list]))
+    matrix = np.full((len(series_list), len(all_dates)), np.nan)
+    for row, (dates, values) in enumerate(series_list):
+        matrix[row, np.searchsorted(all_dates, dates)] = values
+    return all_dates, matrix
@@ -0,0 +1,72 @@
+import csv
+import glob
+import sys
+import numpy as np
+from columnar_store import STORE_DIR, load_bars, store_name
+from mad_engine import align_series, batch_lagged_mad
+
+# 默认扫描的窗口大小与阈值
+WINDOW_SIZES = (10, 20, 40)
+THRESHOLD = 2.0
+
+# 指数分组的汇总文件
+AGGREGATE_FILES = ["沪深300ETF.csv", "中证1000ETF.csv"]
+
+
+def load_aggregate(filename):
+    """
+    读取分组汇总CSV（交易日期, 总成交额(万元)），返回 (日期数组, 成交额数组)
+    """
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        rows = [(int(row[0]), float(row[1])) for row in reader if len(row) >= 2 and row[1]]
+    rows.sort()
+    return (np.array([d for d, _ in rows], dtype=np.int32),
+            np.array([v for _, v in rows], dtype=np.float64))
+
+
+def load_universe(pattern="*_S[HZ].csv", aggregates=AGGREGATE_FILES, column="amount",
+                  store_dir=STORE_DIR):
+    """
+    读取全部单只ETF的列式存储和分组汇总，按日期对齐为一个矩阵
+
+    返回 (名称列表, 日期数组, 二维数组)
+    """
+    names, series = [], []
+    for filename in sorted(glob.glob(pattern)):
+        name = store_name(filename)
+        bars = load_bars(name, store_dir)
+        names.append(name)
+        series.append((bars["date"], bars[column]))
+    for filename in aggregates:
+        try:
+            series.append(load_aggregate(filename))
+            names.append(store_name(filename))
+        except FileNotFoundError:
+            print(f"未找到 {filename}，跳过")
+    dates, matrix = align_series(series)
+    return names, dates, matrix
+
+
+def scan(ks=WINDOW_SIZES, threshold=THRESHOLD):
+    """
+    对全部序列、全部窗口大小一次性计算修正Z分数，打印最新交易日的结果
+    """
+    names, dates, matrix = load_universe()
+    if not names:
+        print("没有可扫描的数据")
+        return {}
+    results = batch_lagged_mad(matrix, ks, threshold)
+    print(f"共 {len(names)} 条序列，{len(dates)} 个交易日，最新日期 {dates[-1]}")
+    for k, (is_outlier, z_scores) in results.items():
+        print(f"\n窗口 k={k}，阈值 {threshold}：")
+        for i, name in enumerate(names):
+            flag = "异常" if is_outlier[i, -1] else ""
+            print(f"{name:<16} Z={z_scores[i, -1]:10.4f} {flag}  历史异常 {is_outlier[i].sum()} 次")
+    return results
+
+
+if __name__ == "__main__":
+    ks = tuple(int(k) for k in sys.argv[1].split(",")) if len(sys.argv) > 1 else WINDOW_SIZES
+    scan(ks)
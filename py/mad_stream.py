@@ -0,0 +1,153 @@
+import collections
+import csv
+import json
+import os
+import sys
+from mad_engine import SortedWindow, modified_z_score
+
+# 状态文件：保存最近 k 个观测值及最后处理的日期
+STATE_FILE = "mad_state.json"
+
+# 默认窗口大小与阈值（与 mad.py 一致）
+WINDOW_SIZE = 20
+THRESHOLD = 2.0
+
+# 每日检测的数据源：历史窗口数据在前，新数据在后
+HISTORY_FILE = "20天窗口数据.csv"
+DATA_FILE = "沪深300ETF.csv"
+
+
+class StreamingMAD:
+    """
+    流式滑动滞后窗口MAD检测器
+
+    只保留最近 k 个观测值：按到达顺序的队列用于移出最旧值，有序窗口用于
+    求中位数和MAD。每次 push() 只对新的一天打分，O(log k)，与历史长度无关，
+    结果与 lagged_rolling_mad 对完整序列计算的最后一点相同。
+    """
+
+    def __init__(self, k=WINDOW_SIZE, threshold=THRESHOLD, values=(), last_date=None):
+        self.k = k
+        self.threshold = threshold
+        self.queue = collections.deque(values[-k:] if values else ())
+        self.window = SortedWindow(self.queue)
+        self.last_date = last_date
+        self.last_result = None
+
+    def ready(self):
+        return len(self.queue) >= self.k
+
+    def score(self, value):
+        """
+        计算新观测值相对当前窗口的修正Z分数，不修改窗口；窗口未满时返回 None
+        """
+        if not self.ready():
+            return None
+        median_val = self.window.median()
+        return modified_z_score(value, median_val, self.window.mad(median_val))
+
+    def push(self, value, date=None):
+        """
+        加入一个新观测值，返回 (z_score, is_outlier)
+
+        窗口未满时只积累数据，返回 (None, False)。date 不晚于上次处理的日期时
+        不重复加入，直接返回上次的结果，便于每日任务重复运行。
+        """
+        if date is not None and self.last_date is not None and date <= self.last_date:
+            return self.last_result or (None, False)
+
+        value = float(value)
+        z_score = self.score(value)
+        is_outlier = z_score is not None and abs(z_score) > self.threshold
+
+        self.queue.append(value)
+        self.window.add(value)
+        if len(self.queue) > self.k:
+            self.window.remove(self.queue.popleft())
+        if date is not None:
+            self.last_date = date
+        self.last_result = (z_score, is_outlier)
+        return self.last_result
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "threshold": self.threshold,
+            "last_date": self.last_date,
+            "last_result": self.last_result,
+            "values": list(self.queue),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        detector = cls(state["k"], state["threshold"], state["values"], state.get("last_date"))
+        if state.get("last_result"):
+            detector.last_result = tuple(state["last_result"])
+        return detector
+
+    def save(self, filename=STATE_FILE):
+        """
+        原子写入状态文件
+        """
+        tmp = f"{filename}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename=STATE_FILE):
+        """
+        读取状态文件，不存在时返回 None
+        """
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+
+def read_series(filename):
+    """
+    读取（交易日期, 总成交额(万元)）两列的CSV，返回按日期升序的 [(日期, 数值)]
+    """
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        rows = {int(row[0]): float(row[1]) for row in reader if len(row) >= 2 and row[1]}
+    return sorted(rows.items())
+
+
+def run_daily(data_file=DATA_FILE, history_file=HISTORY_FILE, state_file=STATE_FILE,
+              k=WINDOW_SIZE, threshold=THRESHOLD):
+    """
+    每日检测：只对状态文件中最后日期之后的新数据打分
+
+    没有状态文件时，由历史窗口数据初始化（不打分）。返回 [(日期, Z分数, 是否异常)]
+    """
+    detector = StreamingMAD.load(state_file)
+    if detector is None:
+        detector = StreamingMAD(k, threshold)
+        if os.path.exists(history_file):
+            for date, value in read_series(history_file):
+                detector.push(value, date)
+            print(f"由 {history_file} 初始化窗口（{len(detector.queue)} 个观测值）")
+
+    results = []
+    for date, value in read_series(data_file):
+        if detector.last_date is not None and date <= detector.last_date:
+            continue
+        z_score, is_outlier = detector.push(value, date)
+        results.append((date, z_score, is_outlier))
+        if z_score is None:
+            print(f"{date}: 窗口数据不足 {detector.k} 天，暂不检测")
+        else:
+            print(f"{date}: Z={z_score:.4f} {'异常' if is_outlier else '正常'}")
+
+    detector.save(state_file)
+    if not results:
+        print(f"没有 {detector.last_date} 之后的新数据")
+    return results
+
+
+if __name__ == "__main__":
+    run_daily(*sys.argv[1:3])
@@ -0,0 +1,105 @@
+import csv
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from mad_engine import batch_lagged_mad
+from mad_scan import load_universe
+
+# 默认扫描网格
+WINDOW_SIZES = (10, 15, 20, 30, 40, 60)
+THRESHOLDS = (1.5, 1.75, 2.0, 2.5, 3.0)
+
+# README 中已知的干预时段（名称, 起始日期, 结束日期），用于核对检测结果
+KNOWN_EVENTS = [
+    ("2023年8月底模型信号", 20230821, 20230831),
+    ("2023年10月汇金公告增持", 20231001, 20231031),
+    ("2024年春节后成交量异动", 20240218, 20240308),
+]
+
+# 扫描结果输出文件
+OUTPUT_FILE = "MAD参数扫描.csv"
+
+
+def _z_scores_for_k(args):
+    """
+    进程池任务：计算一个窗口大小下所有序列的修正Z分数（与阈值无关）
+    """
+    matrix, k = args
+    _, z_scores = batch_lagged_mad(matrix, (k,))[k]
+    return k, z_scores
+
+
+def sweep(matrix, ks=WINDOW_SIZES, thresholds=THRESHOLDS, max_workers=None):
+    """
+    对 (k, 阈值) 网格做参数扫描
+
+    每个 k 的窗口中位数/MAD 只计算一次，得到的Z分数矩阵在所有阈值间共享；
+    不同的 k 分配到进程池并行计算。返回 {(k, 阈值): 异常布尔矩阵}
+    """
+    tasks = [(matrix, k) for k in ks]
+    if max_workers == 1 or len(ks) == 1:
+        outputs = list(map(_z_scores_for_k, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(_z_scores_for_k, tasks))
+
+    results = {}
+    for k, z_scores in outputs:
+        abs_z = np.abs(np.nan_to_num(z_scores))
+        for threshold in thresholds:
+            results[(k, threshold)] = abs_z > threshold
+    return results
+
+
+def matched_events(hit_dates, events=KNOWN_EVENTS):
+    """
+    返回检测日期落入的已知干预时段名称
+    """
+    return [name for name, start, end in events
+            if np.any((hit_dates >= start) & (hit_dates <= end))]
+
+
+def build_table(names, dates, results, events=KNOWN_EVENTS):
+    """
+    汇总为表格行：k、阈值、序列、命中次数、命中日期、对应的已知事件
+    """
+    rows = []
+    for (k, threshold), is_outlier in sorted(results.items()):
+        for i, name in enumerate(names):
+            hit_dates = dates[is_outlier[i]]
+            rows.append([k, threshold, name, len(hit_dates),
+                         " ".join(str(d) for d in hit_dates),
+                         "；".join(matched_events(hit_dates, events))])
+    return rows
+
+
+def main(ks=WINDOW_SIZES, thresholds=THRESHOLDS, output=OUTPUT_FILE):
+    names, dates, matrix = load_universe()
+    if not names:
+        print("没有可扫描的数据")
+        return []
+    print(f"共 {len(names)} 条序列，{len(dates)} 个交易日，"
+          f"{len(ks)} 个窗口 × {len(thresholds)} 个阈值")
+    results = sweep(matrix, ks, thresholds)
+    rows = build_table(names, dates, results)
+
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["窗口", "阈值", "序列", "命中次数", "命中日期", "已知事件"])
+        writer.writerows(rows)
+
+    print(f"\n{'窗口':>4} {'阈值':>6} {'总命中':>6} {'命中事件数':>8}")
+    for (k, threshold), is_outlier in sorted(results.items()):
+        hits = int(is_outlier.sum())
+        events = {event for i in range(len(names))
+                  for event in matched_events(dates[is_outlier[i]])}
+        print(f"{k:>6} {threshold:>8} {hits:>8} {len(events):>10}")
+    print(f"\n扫描结果已保存到 {output}")
+    return rows
+
+
+if __name__ == "__main__":
+    ks = tuple(int(k) for k in sys.argv[1].split(",")) if len(sys.argv) > 1 else WINDOW_SIZES
+    thresholds = (tuple(float(t) for t in sys.argv[2].split(","))
+                  if len(sys.argv) > 2 else THRESHOLDS)
+    main(ks, thresholds)
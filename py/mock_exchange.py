@@ -0,0 +1,162 @@
+import datetime
+import json
+import math
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# 深圳接口每页返回的记录数
+SZSE_PAGE_SIZE = 20
+
+
+def synthetic_bar(code, date):
+    """
+    根据 (代码, 日期) 生成确定性的模拟日线数据，周末返回 None
+    """
+    if date.weekday() >= 5:
+        return None
+    rng = random.Random(f"{code}{date:%Y%m%d}")
+    prev_close = round(rng.uniform(1, 6), 3)
+    change = rng.uniform(-0.03, 0.03)
+    close = round(prev_close * (1 + change), 3)
+    open_price = round(prev_close * (1 + rng.uniform(-0.01, 0.01)), 3)
+    high = round(max(open_price, close) * (1 + rng.uniform(0, 0.01)), 3)
+    low = round(min(open_price, close) * (1 - rng.uniform(0, 0.01)), 3)
+    volume = round(rng.uniform(1e4, 5e5), 2)
+    amount = round(volume * close, 2)
+    return {
+        "prev_close": prev_close, "open": open_price, "high": high, "low": low,
+        "close": close, "change_pct": round(change * 100, 5),
+        "volume": volume, "amount": amount,
+    }
+
+
+def synthetic_shares(code, date):
+    """
+    根据 (代码, 日期) 生成确定性的模拟基金份额（万份）和单位净值，周末返回 None
+    """
+    bar = synthetic_bar(code, date)
+    if bar is None:
+        return None
+    base = random.Random(code).uniform(5e5, 5e6)
+    noise = random.Random(f"{code}{date:%Y%m%d}shares").uniform(-0.005, 0.005)
+    shares = base * (1 + 0.2 * math.sin(date.toordinal() / 50) + noise)
+    return {"date": date.strftime('%Y%m%d'), "shares": round(shares, 2), "nav": bar["close"]}
+
+
+def shares_payload(code, begin, end):
+    """
+    基金份额接口的返回数据（按日期升序）
+    """
+    rows = []
+    current_date = begin
+    while current_date <= end:
+        row = synthetic_shares(code, current_date)
+        if row is not None:
+            rows.append(row)
+        current_date += datetime.timedelta(days=1)
+    return {"data": rows}
+
+
+def sse_payload(code, date):
+    """
+    上证接口格式的返回数据
+    """
+    bar = synthetic_bar(code, date)
+    if bar is None:
+        return {"result": []}
+    return {"result": [{
+        "SEC_NAME": f"ETF{code}", "SEC_CODE": code, "TX_DATE": date.strftime('%Y%m%d'),
+        "CLOSE_PRICE": bar["close"], "CHANGE_RATE": bar["change_pct"],
+        "HIGH_PRICE": bar["high"], "LOW_PRICE": bar["low"],
+        "TRADE_VOL": bar["volume"], "TRADE_AMT": bar["amount"],
+    }]}
+
+
+def szse_rows(code, begin, end):
+    """
+    深圳接口格式的数据行（按日期倒序，与交易所网页一致）
+    """
+    rows = []
+    current_date = end
+    while current_date >= begin:
+        bar = synthetic_bar(code, current_date)
+        if bar is not None:
+            rows.append({
+                "zqjc": f"ETF{code}", "zqdm": code, "jyrq": current_date.strftime('%Y-%m-%d'),
+                "qss": f"{bar['prev_close']:.3f}", "ks": f"{bar['open']:.3f}",
+                "zg": f"{bar['high']:.3f}", "zd": f"{bar['low']:.3f}",
+                "ss": f"{bar['close']:.3f}", "sdf": f"{bar['change_pct']:.2f}",
+                "cjgs": f"{bar['volume']:,.2f}", "cjje": f"{bar['amount']:,.2f}",
+            })
+        current_date -= datetime.timedelta(days=1)
+    return rows
+
+
+def szse_payload(code, begin, end, page=1):
+    """
+    深圳接口格式的返回数据（分页）
+    """
+    rows = szse_rows(code, begin, end)
+    page_count = max(1, (len(rows) + SZSE_PAGE_SIZE - 1) // SZSE_PAGE_SIZE)
+    start = (page - 1) * SZSE_PAGE_SIZE
+    return [{
+        "metadata": {"pagecount": page_count, "pageno": page, "pagesize": SZSE_PAGE_SIZE,
+                     "recordcount": len(rows)},
+        "data": rows[start:start + SZSE_PAGE_SIZE],
+    }]
+
+
+class MockExchangeHandler(BaseHTTPRequestHandler):
+    """
+    同时模拟上证 commonQuery.do、深圳 ShowReport/data 和基金份额 fundShares 接口，支持长连接
+    """
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体一次写出，避免长连接下 Nagle 与延迟确认叠加产生 40ms 延迟
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.request_count += 1
+
+        if url.path.endswith("/commonQuery.do"):
+            date = datetime.datetime.strptime(query["TX_DATE"], '%Y%m%d').date()
+            payload = sse_payload(query["SEC_CODE"], date)
+            body = f"{query.get('jsonCallBack', 'cb')}({json.dumps(payload)})"
+        elif url.path.endswith("/ShowReport/data"):
+            begin = datetime.date.fromisoformat(query["txtBeginDate"])
+            end = datetime.date.fromisoformat(query["txtEndDate"])
+            payload = szse_payload(query["txtDMorJC"], begin, end, int(query.get("PAGENO", 1)))
+            body = json.dumps(payload)
+        elif url.path.endswith("/fundShares"):
+            begin = datetime.date.fromisoformat(query["begin"])
+            end = datetime.date.fromisoformat(query["end"])
+            body = json.dumps(shares_payload(query["code"], begin, end))
+        else:
+            self.send_error(404)
+            return
+
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(port=0):
+    """
+    在后台线程启动模拟交易所服务器，返回 (server, base_url)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockExchangeHandler)
+    server.daemon_threads = True
+    server.request_count = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
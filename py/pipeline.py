@@ -0,0 +1,316 @@
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# 各阶段上次运行的输入/输出指纹
+STATE_FILE = "pipeline_state.json"
+
+# 并行执行的阶段数
+MAX_WORKERS = 4
+
+# 做MAD异常检测的分组
+DETECT_GROUPS = ["沪深300"]
+
+
+def file_digest(paths):
+    """
+    多个文件内容的联合哈希，缺失的文件计为空
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.encode("utf-8"))
+        try:
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        except FileNotFoundError:
+            digest.update(b"-")
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+
+    func: 接收 {依赖阶段名: 结果} 并返回本阶段结果的函数
+    deps: 依赖的阶段名
+    inputs: 除依赖阶段外的输入文件（内容计入指纹）
+    outputs: 返回产出文件列表的函数；输出指纹由其内容计算，产出缺失时不跳过
+    always: 每次都执行（例如抓取，输入来自网络）
+    lock: 持有同名锁的阶段不会同时执行（pyplot 的全局状态不是线程安全的）
+    """
+
+    def __init__(self, name, func, deps=(), inputs=(), outputs=None, always=False, lock=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = outputs
+        self.always = always
+        self.lock = lock
+
+
+class Pipeline:
+    """
+    按依赖关系（DAG）调度的流水线
+
+    依赖都已完成的阶段放入线程池并行执行，结果在内存中直接传给下游。
+    每个阶段的输入指纹 = 上游输出指纹 + 输入文件内容；与上次相同且产出都在时跳过。
+    被跳过的阶段若有下游需要重新执行，会在下游取结果时补算。
+    """
+
+    def __init__(self, stages, state_file=STATE_FILE, max_workers=MAX_WORKERS):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.max_workers = max_workers
+        self.locks = {stage.lock: threading.Lock() for stage in stages if stage.lock}
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖的 {dep} 不存在")
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.state_file)
+
+    def _input_fingerprint(self, stage):
+        digest = hashlib.sha256(stage.name.encode("utf-8"))
+        for dep in stage.deps:
+            digest.update(self.fingerprints[dep].encode("utf-8"))
+        digest.update(file_digest(stage.inputs).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _execute(self, stage):
+        """
+        执行阶段函数（需要时先补算被跳过的上游），返回结果
+        """
+        with self.stage_locks[stage.name]:
+            if stage.name in self.results:
+                return self.results[stage.name]
+            inputs = {dep: self._execute(self.stages[dep]) for dep in stage.deps}
+            lock = self.locks.get(stage.lock)
+            if lock:
+                with lock:
+                    result = stage.func(inputs)
+            else:
+                result = stage.func(inputs)
+            self.results[stage.name] = result
+            return result
+
+    def _run_stage(self, stage, force):
+        in_fp = self._input_fingerprint(stage)
+        saved = self.state.get(stage.name, {})
+        outputs = stage.outputs() if stage.outputs else []
+        if (not force and not stage.always and saved.get("in") == in_fp
+                and all(os.path.exists(path) for path in outputs)):
+            return "跳过", in_fp, saved.get("out", in_fp)
+
+        self._execute(stage)
+        outputs = stage.outputs() if stage.outputs else []
+        out_fp = file_digest(outputs) if outputs else in_fp
+        return "完成", in_fp, out_fp
+
+    def run(self, force=False, only=None):
+        """
+        执行流水线，返回 {阶段名: 状态}；only 为阶段名列表时只执行这些阶段及其上游
+        """
+        self.state = self._load_state()
+        self.results = {}
+        self.fingerprints = {}
+        self.stage_locks = {name: threading.RLock() for name in self.stages}
+
+        selected = set(self.stages)
+        if only:
+            selected = set()
+            todo = list(only)
+            while todo:
+                name = todo.pop()
+                if name not in selected:
+                    selected.add(name)
+                    todo.extend(self.stages[name].deps)
+
+        status = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while len(status) < len(selected):
+                for name in selected:
+                    stage = self.stages[name]
+                    if name in status or name in running.values():
+                        continue
+                    if any(status.get(dep) is None for dep in stage.deps):
+                        continue
+                    if any(status[dep] == "失败" for dep in stage.deps):
+                        status[name] = "失败"
+                        print(f"[{name}] 上游失败，未执行")
+                        continue
+                    running[executor.submit(self._run_stage, stage, force)] = name
+                if not running:
+                    if len(status) < len(selected):
+                        raise ValueError("阶段之间存在循环依赖")
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status[name], in_fp, self.fingerprints[name] = future.result()
+                        self.state[name] = {"in": in_fp, "out": self.fingerprints[name]}
+                    except BaseException as e:
+                        status[name] = "失败"
+                        print(f"[{name}] 执行失败: {e!r}")
+                    print(f"[{name}] {status[name]}")
+
+        self._save_state()
+        return status
+
+
+def _group_codes(config):
+    codes = list(dict.fromkeys(code for group in config["groups"].values() for code in group["codes"]))
+    return ([code.split("_")[0] for code in codes if code.endswith("_SH")],
+            [code.split("_")[0] for code in codes if code.endswith("_SZ")],
+            codes)
+
+
+def build_pipeline(date=None, config=None):
+    """
+    日常流水线：抓取(上证/深圳) → 列式存储 → 分组汇总 → 超额流入/MAD检测 → 绘图
+
+    配置了份额数据源（share_source）时，另有份额流入阶段独立执行
+
+    沪深300、中证1000 等分组在汇总之后各自成为独立分支并行执行
+    """
+    from index_groups import load_config
+
+    config = config or load_config()
+    date = date or datetime.date.today()
+    # 图片按运行当天命名（与绘图脚本一致）
+    yymmdd = datetime.date.today().strftime("%y%m%d")
+    groups = config["groups"]
+    sh_codes, sz_codes, codes = _group_codes(config)
+    csv_files = [f"{code}.csv" for code in codes]
+
+    def fetch_sh(inputs):
+        from sse_data_fetcher import sh_fetch_and_save_data
+        return sh_fetch_and_save_data(sh_codes, date, date)
+
+    def fetch_sz(inputs):
+        from szse_data_fetcher import sz_fetch_and_save_data
+        return sz_fetch_and_save_data(sz_codes, date, date)
+
+    def normalize(inputs):
+        # 抓取程序已为写入的文件重建存储；这里补上被外部修改过的CSV
+        from columnar_store import STORE_DIR, build_from_csv, store_name
+        rebuilt = []
+        for filename in csv_files:
+            meta = os.path.join(STORE_DIR, store_name(filename), "meta.json")
+            if os.path.exists(filename) and (not os.path.exists(meta)
+                                             or os.path.getmtime(meta) < os.path.getmtime(filename)):
+                build_from_csv(filename)
+                rebuilt.append(filename)
+        return rebuilt
+
+    def aggregate(inputs):
+        from aggregate import aggregate_all
+        from index_groups import load_group_totals
+        aggregate_all(config)
+        return load_group_totals(groups)
+
+    def inflow(inputs):
+        from excess_inflow import update_all
+        return update_all(config)
+
+    def shares(inputs):
+        from share_flow import update_all
+        return update_all(config=config)
+
+    def chart(name):
+        def run(inputs):
+            from render import render_volume_chart, volume_chart_specs
+            dates, totals = inputs["aggregate"]
+            spec, = volume_chart_specs(dates, {name: totals[name]}, {"groups": {name: groups[name]}},
+                                       yymmdd)
+            return render_volume_chart(spec)
+        return run
+
+    def stream(name):
+        def run(inputs):
+            # 每日告警：流式检测只对状态文件之后的新交易日打分，状态随数据一起提交
+            import mad
+            from mad_stream import STATE_FILE, run_daily
+            return run_daily(groups[name]["output"], mad.HISTORY_FILE, f"{name}_{STATE_FILE}")
+        return run
+
+    def detect(name):
+        # 图表需要新数据部分完整的Z分数序列，因此这里仍对全部历史计算一遍（O(n log k)）
+        def run(inputs):
+            import numpy as np
+            import pandas as pd
+            import mad
+            dates, totals = inputs["aggregate"]
+            total = totals[name]
+            keep = ~np.isnan(total)
+            new_df = pd.DataFrame({"交易日期": dates[keep], "总成交额(万元)": np.round(total[keep], 2)})
+            hist_df = pd.read_csv(mad.HISTORY_FILE)
+            df, new_data_start_idx = mad.detect(hist_df, new_df)
+            return hist_df, new_df, df, new_data_start_idx
+        return run
+
+    def mad_chart(name):
+        def run(inputs):
+            import mad
+            hist_df, new_df, df, new_data_start_idx = inputs[f"detect_{name}"]
+            return mad.plot_cached(df, new_data_start_idx)
+        return run
+
+    stages = [
+        Stage("fetch_sh", fetch_sh, always=True, outputs=lambda: [f for f in csv_files if f.endswith("_SH.csv")]),
+        Stage("fetch_sz", fetch_sz, always=True, outputs=lambda: [f for f in csv_files if f.endswith("_SZ.csv")]),
+        Stage("normalize", normalize, deps=["fetch_sh", "fetch_sz"]),
+        Stage("aggregate", aggregate, deps=["normalize"],
+              outputs=lambda: [group["output"] for group in groups.values()]),
+        Stage("inflow", inflow, deps=["normalize"],
+              outputs=lambda: [f"{name}超额流入.csv" for name in groups]),
+    ]
+    if config.get("share_source"):
+        # 份额数据来自独立的数据源，不依赖行情抓取；每次运行都增量更新
+        stages.append(Stage("shares", shares, always=True,
+                            outputs=lambda: [f"{name}份额流入.csv" for name in groups]))
+    for name, group in groups.items():
+        if "chart" in group:
+            # 成交量图不经过 pyplot，可与其他分支并行
+            stages.append(Stage(f"chart_{name}", chart(name), deps=["aggregate"],
+                                outputs=lambda name=name: [f"{yymmdd}_{name}ETF成交量.png"]))
+        if name in DETECT_GROUPS:
+            stages.append(Stage(f"stream_{name}", stream(name), deps=["aggregate"],
+                                inputs=["20天窗口数据.csv"],
+                                outputs=lambda name=name: [f"{name}_mad_state.json"]))
+            stages.append(Stage(f"detect_{name}", detect(name), deps=["aggregate"],
+                                inputs=["20天窗口数据.csv"]))
+            stages.append(Stage(f"mad_chart_{name}", mad_chart(name), deps=[f"detect_{name}"],
+                                lock="pyplot",
+                                outputs=lambda name=name: [f"{yymmdd}_{name}ETF滑动滞后窗口MAD异常检测.png"]))
+    return Pipeline(stages)
+
+
+def run_pipeline(force=False, only=None):
+    status = build_pipeline().run(force=force, only=only)
+    failed = [name for name, value in status.items() if value == "失败"]
+    if failed:
+        print(f"以下阶段失败: {', '.join(failed)}")
+    return status
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    run_pipeline(force="--force" in sys.argv[1:], only=args or None)
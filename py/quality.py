@@ -0,0 +1,224 @@
+import csv
+import datetime
+import glob
+import sys
+import time
+import numpy as np
+from columnar_store import store_name
+from trade_calendar import CALENDAR_FILE, load_calendar
+
+# 默认检查的证券文件
+PATTERN = "*_S[HZ].csv"
+
+
+def read_files(pattern=PATTERN):
+    """
+    读取全部证券CSV的日期、数据完整性和成交量，拼成一组扁平数组
+
+    返回 (名称列表, 证券序号, 日期, 是否完整, 成交量)，无日期的行记为日期 0
+    """
+    names, code_index, dates, complete, volume = [], [], [], [], []
+    for i, filename in enumerate(sorted(glob.glob(pattern))):
+        names.append(store_name(filename))
+        with open(filename, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                continue
+            date_i = header.index("交易日期")
+            complete_i = header.index("数据完整性")
+            volume_i = header.index("成交量(万份)")
+            for row in reader:
+                if len(row) != len(header):
+                    continue
+                code_index.append(i)
+                dates.append(int(row[date_i] or 0))
+                complete.append(row[complete_i] == "是")
+                volume.append(float(row[volume_i]) if row[volume_i] else np.nan)
+    return (names, np.array(code_index, dtype=np.int64), np.array(dates, dtype=np.int64),
+            np.array(complete, dtype=bool), np.array(volume, dtype=np.float64))
+
+
+def _to_datetime64(value):
+    return np.datetime64(f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}")
+
+
+def expected_days(start, end, calendar_days):
+    """
+    [start, end] 内的交易日（YYYYMMDD 整数数组）；日历未覆盖的部分按工作日处理
+    """
+    days = np.asarray(calendar_days, dtype=np.int64)
+    days = days[(days >= start) & (days <= end)]
+    last = int(calendar_days[-1]) if len(calendar_days) else 0
+    if end > last:
+        begin = max(start, last + 1)
+        span = np.arange(_to_datetime64(begin), _to_datetime64(end) + 1)
+        span = span[np.is_busday(span)]
+        years = span.astype('datetime64[Y]')
+        months = span.astype('datetime64[M]')
+        weekdays = ((years.astype(np.int64) + 1970) * 10000
+                    + (months - years).astype(np.int64) * 100 + 100
+                    + (span - months).astype(np.int64) + 1)
+        days = np.concatenate([days, weekdays])
+    return days
+
+
+def quality_report(pattern=PATTERN, calendar_file=CALENDAR_FILE):
+    """
+    一次性检查所有证券文件的数据质量
+
+    返回 {"names", "completeness", "monthly", "incomplete", "missing", "duplicates",
+    "zero_volume", "calendar"}：每只证券的完整率、按月完整率、不完整行的日期、
+    相对交易日历缺失的日期（从该证券最早日期到全部文件的最新日期）、重复日期和零成交量日期
+    """
+    names, code_index, dates, complete, volume = read_files(pattern)
+    n = len(names)
+    report = {"names": names, "calendar": "交易日历", "exact_calendar": True}
+    if len(dates) == 0:
+        report.update(completeness={}, monthly=[], incomplete={}, missing={}, duplicates={},
+                      zero_volume={})
+        return report
+
+    # 按证券的完整率
+    total = np.bincount(code_index, minlength=n)
+    done = np.bincount(code_index, weights=complete, minlength=n)
+    report["completeness"] = {names[i]: (int(done[i]), int(total[i])) for i in range(n) if total[i]}
+
+    # 不完整行的日期
+    report["incomplete"] = {}
+    for i, date in zip(code_index[~complete], dates[~complete]):
+        report["incomplete"].setdefault(names[i], []).append(int(date))
+
+    # 按 (证券, 月份) 的完整率
+    keys, inverse = np.unique(code_index * 1000000 + dates // 100, return_inverse=True)
+    month_total = np.bincount(inverse)
+    month_done = np.bincount(inverse, weights=complete)
+    report["monthly"] = [(names[key // 1000000], int(key % 1000000), int(d), int(t))
+                         for key, d, t in zip(keys, month_done, month_total)]
+
+    # 重复日期
+    keys, counts = np.unique(code_index * 100000000 + dates, return_counts=True)
+    dup = keys[(counts > 1) & (keys % 100000000 > 0)]
+    report["duplicates"] = {}
+    for key in dup:
+        report["duplicates"].setdefault(names[key // 100000000], []).append(int(key % 100000000))
+
+    # 零成交量
+    zero = complete & (volume == 0)
+    report["zero_volume"] = {}
+    for i, date in zip(code_index[zero], dates[zero]):
+        report["zero_volume"].setdefault(names[i], []).append(int(date))
+
+    # 相对交易日历缺失的日期：证券 × 交易日 的存在矩阵
+    calendar_days = load_calendar(calendar_file)
+    if calendar_days is None:
+        calendar_days = []
+        report["calendar"] = "工作日（未找到交易日历缓存）"
+        report["exact_calendar"] = False
+    valid = complete & (dates > 0)
+    first = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(first, code_index[valid], dates[valid])
+    expected = expected_days(int(dates[valid].min()) if valid.any() else 0,
+                             int(dates.max()), calendar_days)
+    present = np.zeros((n, len(expected)), dtype=bool)
+    pos = np.searchsorted(expected, dates[valid])
+    in_range = pos < len(expected)
+    pos, codes_valid = pos[in_range], code_index[valid][in_range]
+    hit = expected[pos] == dates[valid][in_range]
+    present[codes_valid[hit], pos[hit]] = True
+    missing = ~present & (expected[None, :] >= first[:, None])
+    report["missing"] = {names[i]: expected[missing[i]].tolist()
+                         for i in range(n) if missing[i].any()}
+    return report
+
+
+def print_report(report):
+    print("=== 数据完整性（按证券） ===")
+    for name, (done, total) in report["completeness"].items():
+        print(f"{name:<12} {done}/{total} 行完整 ({done / total:.1%})")
+
+    print("\n=== 数据完整性（按月） ===")
+    for name, month, done, total in report["monthly"]:
+        print(f"{name:<12} {month}  {done}/{total}")
+
+    print(f"\n=== 缺失交易日（对照{report['calendar']}） ===")
+    for name, days in report["missing"].items():
+        print(f"{name:<12} 缺失 {len(days)} 天: {' '.join(map(str, days))}")
+    if not report["missing"]:
+        print("无")
+
+    print("\n=== 重复日期 ===")
+    for name, days in report["duplicates"].items():
+        print(f"{name:<12} {' '.join(map(str, days))}")
+    if not report["duplicates"]:
+        print("无")
+
+    print("\n=== 零成交量 ===")
+    for name, days in report["zero_volume"].items():
+        print(f"{name:<12} {' '.join(map(str, days))}")
+    if not report["zero_volume"]:
+        print("无")
+
+
+def gate_problems(report, start, end):
+    """
+    [start, end]（YYYYMMDD 整数，含）内的不完整行和缺失交易日，以及重复日期
+
+    用于本次运行抓取的日期范围：这些日期的抓取失败会阻止推送。
+    没有交易日历缓存时按工作日检查会把节假日误报为缺失，此时不检查缺失交易日。
+    返回 {名称: [日期]}
+    """
+    problems = {}
+    sources = [report["incomplete"], report["duplicates"]]
+    if report["exact_calendar"]:
+        sources.append(report["missing"])
+    for source in sources:
+        for name, days in source.items():
+            days = [day for day in days if start <= day <= end]
+            if days:
+                problems.setdefault(name, set()).update(days)
+    return {name: sorted(days) for name, days in problems.items()}
+
+
+def has_problems(report):
+    """
+    存在不完整行、缺失交易日、重复日期或零成交量时返回 True
+
+    没有交易日历缓存时按工作日检查会把节假日误报为缺失，此时不以缺失交易日判定
+    """
+    incomplete = any(done < total for done, total in report["completeness"].values())
+    missing = report["missing"] and report["exact_calendar"]
+    return bool(incomplete or missing or report["duplicates"] or report["zero_volume"])
+
+
+def _option(name, default=None):
+    """
+    读取 --name=value 形式的命令行参数
+    """
+    for arg in sys.argv[1:]:
+        if arg.startswith(f"--{name}="):
+            return arg.split("=", 1)[1]
+    return default
+
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    result = quality_report(*args[:1])
+    print_report(result)
+    print(f"\n检查 {len(result['names'])} 个文件，用时 {time.perf_counter() - t0:.3f} 秒")
+    # --strict：有任何问题（含不完整行、缺失交易日、零成交量）时都以非零状态退出
+    if "--strict" in sys.argv[1:] and has_problems(result):
+        sys.exit(1)
+    # --gate：本次运行的日期范围（--since=YYYYMMDD --until=YYYYMMDD，默认当天，与流水线一致）
+    # 内有不完整行、缺失交易日或重复日期时以非零状态退出，供 CI 在推送前判断
+    if "--gate" in sys.argv[1:]:
+        today = int(datetime.date.today().strftime('%Y%m%d'))
+        since = int(_option("since", today))
+        until = int(_option("until", today))
+        problems = gate_problems(result, since, until)
+        if problems:
+            print(f"\n=== {since}-{until} 内的问题 ===")
+            for name, days in problems.items():
+                print(f"{name:<12} {' '.join(map(str, days))}")
+            sys.exit(1)
@@ -0,0 +1,291 @@
+import dataclasses
+import datetime
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 图片分辨率
+DPI = 300
+
+# 柱状图样式
+BAR_COLOR = '#8B4513'
+
+# 字体查找与解析结果的缓存
+FONT_CACHE = os.path.join(".cache", "font.json")
+
+_font_lock = threading.Lock()
+_font_ready = False
+_local = threading.local()
+
+
+def _find_font(font_dir):
+    ttf_files = sorted(f for f in os.listdir(font_dir) if f.endswith('.ttf'))
+    return os.path.join(font_dir, ttf_files[0]) if ttf_files else None
+
+
+def _load_font_cache(font_dir):
+    """
+    读取字体缓存；字体目录或字体文件有变化时返回 None
+    """
+    try:
+        with open(FONT_CACHE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if "name" not in cache or cache["dir"] != font_dir or cache["dir_mtime_ns"] != os.stat(font_dir).st_mtime_ns:
+            return None
+        if cache["path"] is not None:
+            st = os.stat(cache["path"])
+            if [st.st_size, st.st_mtime_ns] != cache["stat"]:
+                return None
+        return cache
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def _save_font_cache(cache):
+    os.makedirs(os.path.dirname(FONT_CACHE), exist_ok=True)
+    tmp = f"{FONT_CACHE}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp, FONT_CACHE)
+
+
+def _register_cached_font(fm, cache):
+    """
+    把缓存的字体属性直接加入字体管理器；依赖的 matplotlib 内部接口
+    （FontEntry 的字段、_findfont_cached）不可用时退回 addfont 重新解析
+    """
+    try:
+        entries = [fm.FontEntry(**e) for e in cache["entries"]]
+        clear = fm.fontManager._findfont_cached.cache_clear
+    except (TypeError, AttributeError):
+        fm.fontManager.addfont(cache["path"])
+        return
+    fm.fontManager.ttflist.extend(entries)
+    clear()
+
+
+def setup_font(font_dir=SCRIPT_DIR):
+    """
+    注册字体目录下的第一个TTF字体并设为全局字体，每个进程只执行一次
+
+    查找到的字体及其解析出的字体属性缓存在 .cache/font.json，之后的运行
+    不再列目录、也不再解析TTF文件，直接把缓存的属性加入字体管理器。
+    """
+    global _font_ready
+    with _font_lock:
+        if _font_ready:
+            return
+        import matplotlib
+        import matplotlib.font_manager as fm
+
+        cache = _load_font_cache(font_dir)
+        if cache is None:
+            font_path = _find_font(font_dir)
+            name, entries = None, None
+            if font_path:
+                start = len(fm.fontManager.ttflist)
+                fm.fontManager.addfont(font_path)
+                added = fm.fontManager.ttflist[start:]
+                name = added[0].name if added else fm.FontProperties(fname=font_path).get_name()
+                try:
+                    entries = [dataclasses.asdict(e) for e in added]
+                except TypeError:
+                    # FontEntry 不再是 dataclass 时只缓存字体路径和名称
+                    entries = None
+                st = os.stat(font_path)
+            cache = {"dir": font_dir, "dir_mtime_ns": os.stat(font_dir).st_mtime_ns,
+                     "path": font_path, "stat": [st.st_size, st.st_mtime_ns] if font_path else None,
+                     "name": name, "entries": entries}
+            _save_font_cache(cache)
+        elif cache["path"]:
+            _register_cached_font(fm, cache)
+
+        if cache["name"]:
+            matplotlib.rcParams['font.family'] = cache["name"]
+            matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+        _font_ready = True
+
+
+def minmax_decimate(values, max_points):
+    """
+    最大/最小值抽稀：把序列分成 max_points // 2 段，每段保留最小值和最大值所在的点
+
+    返回升序的下标数组；序列不长于 max_points 时返回全部下标。尖峰一定会被保留，
+    NaN 不参与比较（整段都是 NaN 时保留该段第一个点）。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 2)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    blocks = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lo = np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1) + offsets
+    hi = np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1) + offsets
+    idx = np.unique(np.concatenate([lo, hi]))
+    return idx[idx < n]
+
+
+def _figure():
+    """
+    当前线程复用的 Figure（不经过 pyplot，可在多线程中使用）
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = getattr(_local, "figure", None)
+    if fig is None:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        _local.figure = fig
+    fig.clear()
+    return fig
+
+
+def render_volume_chart(spec):
+    """
+    按图表参数绘制一张成交量柱状图，返回图片文件名
+
+    spec: {"filename", "title", "label", "dates"(YYYYMMDD 整数), "values"(十亿元),
+           "baseline"(十亿元), "ymax", "ytick"}
+    数据和参数都与之前某次渲染相同时，直接复用（硬链接）那张图片。
+    """
+    from render_cache import cached_render
+    key, inputs = _cache_key(spec)
+    filename, _ = cached_render(key, spec["filename"], lambda: _draw_volume_chart(spec), inputs)
+    return filename
+
+
+def _cache_key(spec):
+    """
+    渲染键（数据 + 除文件名外的全部参数）及记入清单的输入说明
+    """
+    from render_cache import render_key
+    dates = np.asarray(spec["dates"])
+    values = np.asarray(spec["values"], dtype=np.float64)
+    params = {k: v for k, v in spec.items() if k not in ("filename", "dates", "values")}
+    inputs = {"title": spec["title"], "rows": len(dates),
+              "first": int(dates[0]) if len(dates) else None,
+              "last": int(dates[-1]) if len(dates) else None}
+    return render_key("volume", dates, values, params), inputs
+
+
+def _draw_volume_chart(spec):
+    setup_font()
+    dates = np.asarray(spec["dates"])
+    values = np.asarray(spec["values"], dtype=np.float64)
+    baseline = spec["baseline"]
+
+    fig = _figure()
+    # 根据数据量动态调整宽度
+    fig.set_size_inches(max(8, len(values) * 0.4), 6)
+    ax = fig.add_subplot()
+
+    x_positions = np.arange(len(values))
+    bars = ax.bar(x_positions, values, width=0.4, color=BAR_COLOR, alpha=0.8, label=spec["label"])
+    ax.axhline(y=baseline, color='red', linestyle='--', linewidth=2,
+               label=f'{spec["baseline_label"]}: {baseline:.1f}')
+
+    ax.set_title(spec["title"], fontsize=14, fontweight='bold', pad=15)
+    ax.set_xlabel(f'{dates[-1] // 10000}年' if len(dates) else '', fontsize=11, labelpad=8)
+    ax.set_ylabel('成交量（十亿元）', fontsize=11, labelpad=8)
+
+    top = max(spec["ymax"], values.max() * 1.2 if len(values) else 0)
+    ax.set_ylim(0, top)
+    ax.set_yticks(np.arange(0, top + spec["ytick"], spec["ytick"]))
+    ax.tick_params(axis='y', labelsize=10)
+
+    labels = [f'{d // 100 % 100:02d}/{d % 100:02d}' for d in dates]
+    ax.set_xticks(x_positions, labels, fontsize=9, rotation=45, ha='right')
+    ax.set_xlim(-0.5, len(values) - 0.5)
+
+    ax.legend(loc='upper right', frameon=True, fontsize=10)
+    ax.grid(axis='y', alpha=0.3)
+    # 一次性为所有柱子添加数值标签
+    ax.bar_label(bars, fmt='%.1f', padding=2, fontsize=9, fontweight='bold')
+
+    fig.tight_layout(pad=2.0)
+    fig.savefig(spec["filename"], dpi=spec.get("dpi", DPI), bbox_inches='tight')
+    print(f"图表已保存为: {spec['filename']}")
+    return spec["filename"]
+
+
+def volume_chart_specs(dates, totals, config, yymmdd=None, baselines=None):
+    """
+    由各分组的每日总成交额（万元）生成成交量图参数
+
+    baselines: {分组名: 日均线（十亿元）}，默认使用配置中的默认基准
+    """
+    from index_groups import WAN_PER_BILLION
+    yymmdd = yymmdd or datetime.date.today().strftime("%y%m%d")
+    specs = []
+    for name, group in config["groups"].items():
+        chart = group.get("chart")
+        if chart is None or name not in totals:
+            continue
+        total = totals[name]
+        keep = ~np.isnan(total)
+        baseline = (baselines or {}).get(name, group.get("fallback_baseline", 0))
+        specs.append({
+            "filename": f"{yymmdd}_{name}ETF成交量.png",
+            "title": chart["title"],
+            "label": f"{name}ETF交易总额（十亿元）",
+            "baseline_label": f"{name}ETF日均交易总额（十亿元）",
+            "dates": dates[keep],
+            # 与汇总文件一致，先按万元保留两位小数
+            "values": np.round(total[keep], 2) / WAN_PER_BILLION,
+            "baseline": baseline,
+            "ymax": chart["ymax"],
+            "ytick": chart["ytick"],
+        })
+    return specs
+
+
+def render_charts(specs, processes=0):
+    """
+    在一个进程中依次绘制所有图表（字体只注册一次）；processes > 1 时使用进程池
+
+    是否需要重新渲染由主进程查清单决定，进程池只绘制确实变化了的图表
+    """
+    if processes and processes > 1 and len(specs) > 1:
+        from render_cache import record, reuse
+        changed = []
+        for spec in specs:
+            key, inputs = _cache_key(spec)
+            if not reuse(key, spec["filename"], inputs):
+                changed.append((spec, key, inputs))
+        if changed:
+            errors = []
+            with ProcessPoolExecutor(max_workers=processes, initializer=setup_font) as executor:
+                futures = [(executor.submit(_draw_volume_chart, spec), spec, key, inputs)
+                           for spec, key, inputs in changed]
+                for future, spec, key, inputs in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    # 图片生成之后才写入清单，失败的图表下次仍会重新渲染
+                    record(key, spec["filename"], inputs)
+            if errors:
+                raise errors[0]
+        return [spec["filename"] for spec in specs]
+    return [render_volume_chart(spec) for spec in specs]
+
+
+def main(processes=0):
+    from index_groups import load_config, load_group_totals
+    config = load_config()
+    dates, totals = load_group_totals(config["groups"])
+    return render_charts(volume_chart_specs(dates, totals, config), processes)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
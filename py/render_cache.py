@@ -0,0 +1,121 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+
+# 清单文件：渲染键 -> 生成的图片及其输入摘要
+MANIFEST_FILE = "render_manifest.json"
+
+# 绘图代码有不兼容的改动时修改此版本号，使旧图片全部失效
+RENDER_VERSION = 1
+
+_lock = threading.Lock()
+
+
+def render_key(*parts):
+    """
+    由输入数据和图表参数计算渲染键：数组按类型、形状和原始字节哈希，其余按 JSON 哈希
+    """
+    digest = hashlib.sha256(f"v{RENDER_VERSION}".encode("utf-8"))
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            data = np.ascontiguousarray(part)
+            digest.update(f"{data.dtype.str}{data.shape}".encode("utf-8"))
+            digest.update(data.tobytes())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False,
+                                     default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_manifest(filename=MANIFEST_FILE):
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest, filename):
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, filename)
+
+
+def _link(source, target):
+    """
+    硬链接已有图片，文件系统不支持时复制
+    """
+    tmp = f"{target}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def find_image(key, filename, manifest_file=MANIFEST_FILE):
+    """
+    清单中该键对应的、仍存在的图片（优先 filename 本身），没有时返回 None
+    """
+    with _lock:
+        entry = load_manifest(manifest_file).get(key)
+    if not entry:
+        return None
+    return next((path for path in [filename] + entry["images"] if os.path.exists(path)), None)
+
+
+def record(key, filename, inputs=None, manifest_file=MANIFEST_FILE):
+    """
+    在清单中记录 filename 是该键的渲染结果（必须在图片成功生成之后调用）
+    """
+    with _lock:
+        manifest = load_manifest(manifest_file)
+        entry = manifest.get(key) or {"images": []}
+        entry["images"] = [path for path in entry["images"] if os.path.exists(path) and path != filename]
+        entry["images"].insert(0, filename)
+        entry["inputs"] = inputs
+        entry["updated"] = datetime.datetime.now().isoformat(timespec="seconds")
+        manifest[key] = entry
+        # 同一图片名只属于最新的键
+        for other_key, other in list(manifest.items()):
+            if other_key != key and filename in other["images"]:
+                other["images"].remove(filename)
+                if not other["images"]:
+                    del manifest[other_key]
+        _save_manifest(manifest, manifest_file)
+
+
+def reuse(key, filename, inputs=None, manifest_file=MANIFEST_FILE):
+    """
+    输入未变化时复用已有图片并返回 True；需要重新渲染时返回 False（不修改清单）
+    """
+    source = find_image(key, filename, manifest_file)
+    if source is None:
+        return False
+    if source != filename:
+        _link(source, filename)
+        print(f"输入未变化，复用 {source} -> {filename}")
+    record(key, filename, inputs, manifest_file)
+    return True
+
+
+def cached_render(key, filename, render, inputs=None, manifest_file=MANIFEST_FILE):
+    """
+    输入未变化时复用已有图片，否则调用 render() 生成 filename
+
+    key: render_key 的结果；inputs: 记入清单的输入说明（例如数据的起止日期）
+    清单中该键对应的图片仍存在时：同名则直接返回，不同名（例如新的一天）则硬链接过去。
+    render() 成功之后才更新清单。返回 (图片文件名, 是否重新渲染)
+    """
+    if reuse(key, filename, inputs, manifest_file):
+        return filename, False
+    render()
+    record(key, filename, inputs, manifest_file)
+    return filename, True
@@ -0,0 +1,141 @@
+import datetime
+import hashlib
+import os
+import threading
+import time
+
+# 缓存目录
+CACHE_DIR = os.path.join(".cache", "responses")
+
+# 缓存总大小上限（字节），超过后按最近最少使用淘汰
+MAX_BYTES = 256 * 1024 * 1024
+
+# 未收盘时抓取的数据的有效期（秒）；收盘后抓取的数据不会再变化，永不过期
+TODAY_TTL = 600
+
+# 交易所时区（北京时间）及当日数据发布完成的时间（收盘 15:00 后留出余量）
+EXCHANGE_TZ = datetime.timezone(datetime.timedelta(hours=8))
+FINAL_TIME = datetime.time(16, 0)
+
+# 设为 False 可关闭缓存（例如基准测试需要真实请求时）
+CACHE_ENABLED = True
+
+
+class ResponseCache:
+    """
+    交易所原始响应（JSON/JSONP 文本）的磁盘缓存
+
+    以 (交易所, 代码, 日期[, 结束日期, 页码]) 的 SHA-256 作为文件名。
+    文件的 mtime 为抓取时间，用于判断数据是否已是收盘后的最终数据；atime 在每次命中时
+    更新为访问时间，超过大小上限时按 atime 淘汰最久未用的文件。
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES, today_ttl=TODAY_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.today_ttl = today_ttl
+        self.total_bytes = None
+        self.lock = threading.Lock()
+
+    def _path(self, exchange, code, date, end_date=None, page=1):
+        key = f"{exchange}|{code}|{date}|{end_date or date}|{page}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.raw")
+
+    def _is_final(self, fetched, date, end_date=None):
+        """
+        抓取时间（时间戳）晚于查询最后一天的数据发布时间时，响应是最终数据
+
+        按抓取时间而不是读取时间判断：盘中抓取的响应到了第二天仍是盘中快照
+        """
+        last = datetime.date.fromisoformat(end_date or date)
+        final_at = datetime.datetime.combine(last, FINAL_TIME, tzinfo=EXCHANGE_TZ)
+        return fetched >= final_at.timestamp()
+
+    def get(self, exchange, code, date, end_date=None, page=1):
+        """
+        返回缓存的原始响应文本，未命中或已过期时返回 None
+        """
+        path = self._path(exchange, code, date, end_date, page)
+        try:
+            st = os.stat(path)
+            now = time.time()
+            if (not self._is_final(st.st_mtime, date, end_date)
+                    and now - st.st_mtime > self.today_ttl):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            # 记录访问时间，保留抓取时间
+            os.utime(path, (now, st.st_mtime))
+            return text
+        except FileNotFoundError:
+            return None
+
+    def put(self, exchange, code, date, text, end_date=None, page=1):
+        """
+        原子写入一条响应，超过大小上限时淘汰最久未用的条目
+        """
+        path = self._path(exchange, code, date, end_date, page)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = text.encode("utf-8")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        try:
+            old_size = os.path.getsize(path)
+        except FileNotFoundError:
+            old_size = 0
+        os.replace(tmp, path)
+
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += len(data) - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".raw"):
+                    path = os.path.join(root, name)
+                    try:
+                        yield path, os.stat(path)
+                    except FileNotFoundError:
+                        continue
+
+    def _scan_size(self):
+        return sum(st.st_size for _, st in self._entries())
+
+    def _evict(self):
+        """
+        按最近访问时间从旧到新删除，直到总大小降到上限的 90%
+        """
+        entries = sorted(self._entries(), key=lambda item: item[1].st_atime)
+        total = sum(st.st_size for _, st in entries)
+        target = self.max_bytes * 0.9
+        for path, st in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= st.st_size
+            except FileNotFoundError:
+                pass
+        self.total_bytes = total
+
+
+_cache = None
+
+
+def get_cache():
+    """
+    获取进程内共享的缓存实例，缓存关闭时返回 None
+    """
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
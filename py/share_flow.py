@@ -0,0 +1,233 @@
+import csv
+import datetime
+import sys
+import numpy as np
+from columnar_store import STORE_DIR, load_bars, write_bars
+from http_session import get_session
+from index_groups import WAN_PER_BILLION, load_config, load_group_totals
+
+# 份额存储的列：日期、基金份额(万份)、单位净值、当日份额流入(万元)
+SHARE_COLUMNS = {
+    "date": np.int32,
+    "shares": np.float64,
+    "nav": np.float64,
+    "flow": np.float64,
+}
+
+# 份额存储名后缀，例如 store/510300_SH_shares/
+STORE_SUFFIX = "_shares"
+
+# 数据源在 index_groups.json 的 "share_source" 中配置：本地CSV（交易日期,证券代码,
+# 基金份额(万份),单位净值）或 http(s):// 接口地址；未配置时不更新
+SOURCE_KEY = "share_source"
+
+# 首次抓取的起始日期
+START_DATE = 20230101
+
+# 每次重新请求存储最后日期之前的天数（自然日），用于接收迟到或修正的份额数据
+REVISION_DAYS = 14
+
+# 输出表头（金额单位为万元）
+HEADER = ["交易日期", "份额流入(万元)", "累计流入(万元)"]
+
+
+def _to_date(value):
+    return datetime.datetime.strptime(str(value), '%Y%m%d').date()
+
+
+class FileShareSource:
+    """
+    从本地CSV读取份额和净值
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.rows = None
+
+    def _load(self):
+        rows = {}
+        with open(self.filename, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                code = row["证券代码"]
+                rows.setdefault(code, []).append(
+                    (int(row["交易日期"].replace("-", "")),
+                     float(row["基金份额(万份)"]), float(row["单位净值"])))
+        self.rows = rows
+
+    def fetch(self, code, start, end):
+        """
+        返回 [(日期, 份额, 净值)]，start/end 为 YYYYMMDD 整数（含）
+        """
+        if self.rows is None:
+            self._load()
+        return [row for row in self.rows.get(code, []) if start <= row[0] <= end]
+
+
+class HttpShareSource:
+    """
+    从HTTP接口读取份额和净值：GET {base_url}/fundShares?code=&begin=&end=
+    返回 {"data": [{"date": "YYYYMMDD", "shares": ..., "nav": ...}]}
+    """
+
+    def __init__(self, base_url, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = session
+
+    def fetch(self, code, start, end):
+        session = self.session or get_session("fund")
+        params = {"code": code, "begin": _to_date(start).isoformat(),
+                  "end": _to_date(end).isoformat()}
+        response = session.get(f"{self.base_url}/fundShares", params=params, timeout=10)
+        response.raise_for_status()
+        return [(int(row["date"]), float(row["shares"]), float(row["nav"]))
+                for row in response.json()["data"]]
+
+
+def make_source(spec):
+    """
+    http(s):// 开头为接口地址，否则为本地CSV文件
+    """
+    if spec.startswith(("http://", "https://")):
+        return HttpShareSource(spec)
+    return FileShareSource(spec)
+
+
+def update_code(name, source, end_date, store_dir=STORE_DIR, start_date=START_DATE):
+    """
+    增量更新一只ETF的份额存储，返回 (新增或修正的天数, 最早变化的日期)，没有变化时日期为 None
+
+    向数据源请求存储最后日期前 REVISION_DAYS 天起的数据，迟到或修正的份额、净值
+    覆盖存储中的旧值；份额流入 = 份额差 × 当日净值，从最早变化的日期起重新计算。
+    """
+    store_name = f"{name}{STORE_SUFFIX}"
+    try:
+        existing = load_bars(store_name, store_dir, mmap=False, schema=SHARE_COLUMNS)
+    except FileNotFoundError:
+        existing = None
+
+    stored = {}
+    if existing is not None:
+        stored = {int(d): (s, v) for d, s, v in zip(existing["date"], existing["shares"], existing["nav"])}
+    if stored:
+        start = int((_to_date(max(stored)) - datetime.timedelta(days=REVISION_DAYS)).strftime('%Y%m%d'))
+    else:
+        start = start_date
+    if start > end_date:
+        return 0, None
+
+    fetched = {date: (shares, nav) for date, shares, nav in source.fetch(name.split("_")[0],
+                                                                        start, end_date)
+               if date >= start}
+    changed = sorted(d for d, row in fetched.items() if stored.get(d) != row)
+    if not changed:
+        return 0, None
+
+    stored.update(fetched)
+    dates = np.array(sorted(stored), dtype=np.int32)
+    shares = np.array([stored[d][0] for d in dates])
+    nav = np.array([stored[d][1] for d in dates])
+    flow = np.diff(shares, prepend=np.nan) * nav
+
+    columns = {"date": dates, "shares": shares, "nav": nav, "flow": flow}
+    write_bars(store_name, columns, store_dir, schema=SHARE_COLUMNS)
+    return len(changed), changed[0]
+
+
+def output_file(group_name):
+    return f"{group_name}份额流入.csv"
+
+
+def read_rows(filename):
+    """
+    读取已有输出的数据行（不含表头），文件不存在时返回空列表
+    """
+    try:
+        with open(filename, 'r', newline='', encoding='utf-8') as f:
+            return list(csv.reader(f))[1:]
+    except FileNotFoundError:
+        return []
+
+
+def first_changed(rows, dates, daily):
+    """
+    已写出的行与重新汇总的流入第一次不一致的位置；全部一致时返回已写出的行数
+    """
+    for i, row in enumerate(rows):
+        if i >= len(dates) or int(row[0]) != dates[i] or row[1] != f"{daily[i]:.2f}":
+            return i
+    return len(rows)
+
+
+def update_all(source_spec=None, end_date=None, config=None, store_dir=STORE_DIR):
+    """
+    增量更新所有成分ETF的份额存储，并更新各分组的 {分组}份额流入.csv
+
+    只汇总上次输出之后以及份额数据有变化的日期；已写出日期的流入有变化
+    （迟到或修正的份额数据）时，从该日期起重新计算累计流入并重写文件，否则只追加。
+    source_spec 默认取配置中的 share_source；都没有时跳过并返回 {}
+    """
+    config = config or load_config()
+    groups = config["groups"]
+    source_spec = source_spec or config.get(SOURCE_KEY)
+    if not source_spec:
+        print(f"未配置份额数据源（index_groups.json 的 {SOURCE_KEY}），跳过份额流入")
+        return {}
+    source = make_source(source_spec)
+    end_date = end_date or int(datetime.date.today().strftime('%Y%m%d'))
+
+    codes = list(dict.fromkeys(code for group in groups.values() for code in group["codes"]))
+    first_dates = []
+    for code in codes:
+        try:
+            changed, first = update_code(code, source, end_date, store_dir)
+        except Exception as e:
+            print(f"{code} 份额数据更新失败: {e}")
+            continue
+        print(f"{code}: 新增或修正份额数据 {changed} 天")
+        if first is not None:
+            first_dates.append(first)
+
+    # 只读取上次输出之后以及份额数据有变化的日期（since 不含当天，故变化日期减一）
+    outputs = {name: read_rows(output_file(name)) for name in groups}
+    if all(outputs.values()):
+        since = min([int(rows[-1][0]) for rows in outputs.values()] + [d - 1 for d in first_dates])
+    else:
+        since = None
+    dates, totals = load_group_totals(groups, column="flow", store_dir=store_dir, since=since,
+                                      suffix=STORE_SUFFIX, schema=SHARE_COLUMNS)
+
+    results = {}
+    for name in groups:
+        rows = outputs[name]
+        total = totals[name]
+        mask = ~np.isnan(total)
+        valid_dates, valid_daily = dates[mask], total[mask]
+
+        # since 之前的行不受影响，之后的行与重新汇总的结果比较
+        head = [row for row in rows if since is not None and int(row[0]) <= since]
+        tail = rows[len(head):]
+        changed = first_changed(tail, valid_dates, valid_daily)
+        kept = head + tail[:changed]
+        cumulative_start = float(kept[-1][2]) if kept else 0.0
+        new_dates, daily = valid_dates[changed:], valid_daily[changed:]
+        cumulative = cumulative_start + np.cumsum(daily)
+
+        filename = output_file(name)
+        mode = 'a' if rows and changed == len(tail) else 'w'
+        with open(filename, mode, newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if mode == 'w':
+                writer.writerow(HEADER)
+                writer.writerows(kept)
+            writer.writerows([str(d), f"{v:.2f}", f"{c:.2f}"]
+                             for d, v, c in zip(new_dates, daily, cumulative))
+        total_flow = cumulative[-1] if len(cumulative) else cumulative_start
+        action = "新增" if mode == 'a' or not rows else "重算"
+        print(f"{name}: {action} {len(new_dates)} 天，累计份额流入 "
+              f"{total_flow / WAN_PER_BILLION:.2f} 十亿元 -> {filename}")
+        results[name] = (new_dates, daily, cumulative)
+    return results
+
+
+if __name__ == "__main__":
+    update_all(*sys.argv[1:2])
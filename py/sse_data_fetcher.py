@@ -1,20 +1,49 @@
 import datetime
 import time
-import requests
 import json
-import csv
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from http_session import get_session
+from response_cache import get_cache
+from bar_schema import Bar, CSV_HEADER
+from columnar_store import build_from_csv
+from csv_writer import BatchCSVWriter
+from fetch_engine import get_bucket, resume_jobs, run_jobs
+from job_state import JobState
+from trade_calendar import trading_days
 
-def fetch_sse_data(sec_code="510300", date=None, max_retries=3):
+# 上证接口地址（基准测试时可替换为本地模拟服务器）
+SSE_URL = "https://query.sse.com.cn/commonQuery.do"
+
+def parse_jsonp(text):
+    """
+    解析JSONP响应
+    """
+    json_str = text[text.find('(')+1:text.rfind(')')]
+    return json.loads(json_str)
+
+def fetch_sse_data(sec_code="510300", date=None, session=None):
     """
     获取上海证券交易所股票交易数据
+
+    session: 使用的会话，默认为上证共享长连接会话（重试策略由会话统一配置）
+
+    有数据的响应会写入本地原始响应缓存，再次请求同一 (代码, 日期) 时直接读缓存
     """
     if date is None:
         date = datetime.date.today().strftime('%Y-%m-%d')
+    if session is None:
+        session = get_session("sse")
+    
+    # 先查本地缓存
+    cache = get_cache()
+    if cache is not None:
+        text = cache.get("sse", sec_code, date)
+        if text is not None:
+            try:
+                return parse_jsonp(text)
+            except ValueError:
+                pass
     
     # 基础URL和参数
-    base_url = "https://query.sse.com.cn/commonQuery.do"
     callback_id = f"jsonpCallback{int(time.time() * 1000) % 100000000}"
     
     params = {
@@ -31,66 +60,26 @@ def fetch_sse_data(sec_code="510300", date=None, max_retries=3):
         "Referer": "https://www.sse.com.cn/"
     }
     
-    # 配置重试会话
-    session = requests.Session()
-    session.trust_env = False
-    
-    retry = Retry(total=max_retries, backoff_factor=0.5, 
-                 status_forcelist=[429, 500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("https://", adapter)
-    
     try:
-        # 第一次尝试
-        response = session.get(base_url, params=params, headers=headers, timeout=30)
+        # 连接错误和 429/5xx 由会话的重试策略处理
+        response = session.get(SSE_URL, params=params, headers=headers, timeout=30)
         response.raise_for_status()
         
         # 处理JSONP响应
         text = response.text
-        json_str = text[text.find('(')+1:text.rfind(')')]
-        return json.loads(json_str)
+        data = parse_jsonp(text)
+        if cache is not None and data.get("result"):
+            cache.put("sse", sec_code, date, text)
+        return data
         
     except Exception as e:
-        print(f"第一次请求失败: {e}")
-        
-        # 在except块内循环重试3次
-        for retry_count in range(1, 4):  # 重试3次，从1到3
-            try:
-                print(f"第{retry_count+1}次尝试...")
-                
-                # 更新回调ID和随机参数防止缓存
-                callback_id = f"jsonpCallback{int(time.time() * 1000) % 100000000}"
-                params["jsonCallBack"] = callback_id
-                params["_"] = int(time.time() * 1000)
-                
-                # 创建新的会话（避免使用可能已污染的连接）
-                new_session = requests.Session()
-                new_session.trust_env = False
-                
-                # 重新发送请求
-                response = new_session.get(base_url, params=params, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                # 处理JSONP响应
-                text = response.text
-                json_str = text[text.find('(')+1:text.rfind(')')]
-                
-                print(f"第{retry_count+1}次尝试成功！")
-                return json.loads(json_str)
-                
-            except Exception as retry_error:
-                print(f"第{retry_count+1}次尝试失败: {retry_error}")
-                
-                # 如果不是最后一次重试，等待一段时间
-                if retry_count < 3:
-                    wait_time = 2 ** retry_count  # 指数退避：2, 4秒
-                    print(f"等待{wait_time}秒后重试...")
-                    time.sleep(wait_time)
-        
         # 所有重试都失败
-        print("所有重试均失败")
+        print(f"请求失败: {e}")
         return None
 
+# 任务状态文件
+JOB_STATE_FILE = "sh_jobs.json"
+
 def is_json_complete(data):
     """
     判断JSON数据是否完整
@@ -104,109 +93,76 @@ def is_json_complete(data):
     else:
         return "是"
 
-def save_to_csv(data, filename="stock_data.csv"):
+def save_to_csv(data, filename="stock_data.csv", writer=None, sec_code="", date=""):
     """
     将数据保存到CSV文件
+
+    writer: 批量写入器，传入时只缓存该行，由调用方统一写出
+    sec_code/date: 数据不完整时写入失败行的代码和日期，用于之后成功时覆盖该行
     """
-    # 判断数据完整性
-    completeness = is_json_complete(data)
-    
-    # 准备CSV行数据
-    if data and data.get("result"):
-        result = data["result"][0]
-        row = [
-            result.get('SEC_NAME', ''),
-            result.get('SEC_CODE', ''),
-            result.get('TX_DATE', ''),
-            result.get('CLOSE_PRICE', ''),
-            result.get('CHANGE_RATE', ''),
-            result.get('HIGH_PRICE', ''),
-            result.get('LOW_PRICE', ''),
-            result.get('TRADE_VOL', ''),
-            result.get('TRADE_AMT', ''),
-            completeness
-        ]
+    # 统一为标准记录：数值和日期在这里解析一次
+    if is_json_complete(data) == "是":
+        bar = Bar.from_sse(data["result"][0])
     else:
-        # 如果数据不完整，创建空行但仍包含完整性判断
-        row = ['', '', '', '', '', '', '', '', '', completeness]
-    
-    # 写入CSV文件
-    try:
-        # 尝试打开文件以检查是否存在
-        with open(filename, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            # 如果文件存在，则追加数据
-            with open(filename, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(row)
-    except FileNotFoundError:
-        # 如果文件不存在，创建文件并写入表头
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            # 写入表头
-            header = [
-                "证券名称", "证券代码", "交易日期", "收盘价", "涨跌幅(%)", 
-                "最高价", "最低价", "成交量(万份)", "成交额(万元)", "数据完整性"
-            ]
-            writer.writerow(header)
-            writer.writerow(row)
+        # 如果数据不完整，写入只有代码和日期的失败行
+        bar = Bar.failed(sec_code, "SH", date)
+    row = bar.to_row()
     
-    print(f"数据已保存到 {filename}")
+    # 写入CSV文件：未传入写入器时立即写出这一行
+    if writer is None:
+        with BatchCSVWriter() as single_writer:
+            single_writer.write(filename, CSV_HEADER, row)
+    else:
+        writer.write(filename, CSV_HEADER, row)
 
-def sh_fetch_and_save_data(codes, start_date=None, end_date=None):
+def sh_fetch_and_save_data(codes, start_date=None, end_date=None, max_workers=4, rate=2.0,
+                           batch_size=500, skip_existing=True):
     """
     获取并保存多个代码的数据
+
+    max_workers: 并发请求线程数
+    rate: 上证接口限速（每秒请求数），替代原来每次请求后固定等待5秒
+    batch_size: 每个CSV文件缓存多少行后写出一次
+    skip_existing: 跳过CSV中已有完整数据的日期；失败的日期会重新请求并覆盖原来的失败行
+
+    任务状态保存在 sh_jobs.json，之前中断或失败的任务会并入本次运行
     """
     if start_date is None:
         start_date = datetime.date.today()
     if end_date is None:
         end_date = datetime.date.today()
     
-    # 设定每天递增的间隔（一天）
-    delta = datetime.timedelta(days=1)
+    # 持久化任务队列：中断或失败的任务在下次运行时自动续跑
+    state = JobState(JOB_STATE_FILE)
+    dates = [d.strftime('%Y-%m-%d') for d in trading_days(start_date, end_date)]
     
-    # 统计网络请求成功和失败次数
-    success_count = 0
-    fail_count = 0
-    
-    for code in codes:
-        # 为每个代码创建CSV文件
-        csv_filename = f"{code}_SH.csv"
+    # 同一次运行的所有行缓存在写入器中，结束时（或出错时）统一原子写出
+    with BatchCSVWriter(batch_size=batch_size) as writer:
+        def store_of(code):
+            # 为每个代码创建CSV文件
+            return writer.store(f"{code}_SH.csv", CSV_HEADER)
         
-        # 循环遍历日期
-        current_date = start_date
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            print(f"正在获取代码 {code} 日期 {date_str} 的数据...")
-            
-            # 获取数据
-            try:
-                data = fetch_sse_data(sec_code=code, date=date_str)
-                
-                # 如果fetch_sse_data返回None，表示请求失败
-                if data is None:
-                    # 保存空数据到CSV
-                    save_to_csv(None, csv_filename)
-                    fail_count += 1
-                    print(f"代码 {code} 日期 {date_str} 请求失败")
-                else:
-                    # 保存数据到CSV
-                    save_to_csv(data, csv_filename)
-                    success_count += 1
-                    print(f"代码 {code} 日期 {date_str} 请求成功")
-                    
-            except Exception as e:
-                # 如果fetch_sse_data抛出异常，表示请求失败
-                print(f"代码 {code} 日期 {date_str} 请求异常: {e}")
-                # 保存空数据到CSV
-                save_to_csv(None, csv_filename)
-                fail_count += 1
-            
-            # 将当前日期增加一天
-            current_date += delta
-            
-            # 单线程调用间隔5秒
-            time.sleep(5)
+        # 只对交易日生成任务，非交易日不发请求；已有完整数据的日期跳过
+        jobs = resume_jobs(state, codes, dates, store_of, skip_existing)
+        
+        def fetch(code, date_str):
+            return fetch_sse_data(sec_code=code, date=date_str)
+        
+        def save(code, date_str, data):
+            save_to_csv(data, f"{code}_SH.csv", writer=writer, sec_code=code, date=date_str)
+            state.mark(code, date_str, is_json_complete(data) == "是")
+        
+        # 并发获取，统计网络请求成功和失败次数
+        success_count, fail_count = run_jobs(jobs, fetch, save, get_bucket("sse", rate),
+                                             max_workers=max_workers)
+    
+    # 与CSV一起更新列式存储
+    for filename in sorted(writer.flushed):
+        build_from_csv(filename)
+    
+    # CSV写出后再保存任务状态，只保留失败的任务留待下次重试
+    state.prune()
+    state.save()
     
     # 最终统计结果
     print(f"上证所有任务完成！成功次数: {success_count}, 失败次数: {fail_count}")
@@ -1,25 +1,53 @@
 import datetime
+import json
 import time
-import requests
-import csv
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from http_session import get_session
+from response_cache import get_cache
+from bar_schema import Bar, CSV_HEADER
+from columnar_store import build_from_csv
+from csv_writer import BatchCSVWriter
+from fetch_engine import get_bucket, resume_jobs, run_jobs
+from job_state import JobState
+from trade_calendar import trading_days
 
-def fetch_szse_data(sec_code="159919", date="2025-09-09", max_retries=3):
+# 深圳接口地址（基准测试时可替换为本地模拟服务器）
+SZSE_URL = "https://www.szse.cn/api/report/ShowReport/data"
+
+def fetch_szse_data(sec_code="159919", date="2025-09-09", session=None, end_date=None, page=1):
     """
     获取深圳证券交易所股票交易数据
+
+    session: 使用的会话，默认为深圳共享长连接会话（重试策略由会话统一配置）
+    end_date: 查询区间的结束日期，默认与 date 相同（只查一天）
+    page: 区间查询结果的页码
+
+    有数据的响应会写入本地原始响应缓存，再次请求同一 (代码, 日期区间, 页码) 时直接读缓存
     """
-    # 基础URL和参数
-    base_url = "https://www.szse.cn/api/report/ShowReport/data"
+    if session is None:
+        session = get_session("szse")
+    if end_date is None:
+        end_date = date
     
+    # 先查本地缓存
+    cache = get_cache()
+    if cache is not None:
+        text = cache.get("szse", sec_code, date, end_date, page)
+        if text is not None:
+            try:
+                return json.loads(text)
+            except ValueError:
+                pass
+    
+    # 基础URL和参数
     params = {
         "SHOWTYPE": "JSON",
         "CATALOGID": "1815_stock_snapshot",
         "TABKEY": "tab2",  # tab2表示基金，tab1表示股票
         "txtDMorJC": sec_code,
         "txtBeginDate": date,
-        "txtEndDate": date,
+        "txtEndDate": end_date,
         "archiveDate": "2023-09-01",  # 固定值
+        "PAGENO": page,
         "random": int(time.time() * 1000)  # 随机数防止缓存
     }
     
@@ -33,58 +61,54 @@ def fetch_szse_data(sec_code="159919", date="2025-09-09", max_retries=3):
         "Sec-Fetch-Mode": "cors"
     }
     
-    # 配置重试会话
-    session = requests.Session()
-    session.trust_env = False
-    
-    retry = Retry(total=max_retries, backoff_factor=0.5, 
-                 status_forcelist=[429, 500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("https://", adapter)
-    
     try:
-        # 第一次尝试
-        response = session.get(base_url, params=params, headers=headers, timeout=30)
+        # 连接错误和 429/5xx 由会话的重试策略处理
+        response = session.get(SZSE_URL, params=params, headers=headers, timeout=30)
         response.raise_for_status()
         
         # 深圳交易所返回标准JSON，无需JSONP处理
-        return response.json()
+        data = response.json()
+        if cache is not None and data and data[0].get("data"):
+            cache.put("szse", sec_code, date, response.text, end_date, page)
+        return data
         
     except Exception as e:
-        print(f"第一次请求失败: {e}")
-        
-        # 在except块内循环重试3次
-        for retry_count in range(1, 4):  # 重试3次，从1到3
-            try:
-                print(f"第{retry_count+1}次尝试...")
-                
-                # 更新随机参数防止缓存
-                params["random"] = int(time.time() * 1000)
-                
-                # 创建新的会话（避免使用可能已污染的连接）
-                new_session = requests.Session()
-                new_session.trust_env = False
-                
-                # 重新发送请求
-                response = new_session.get(base_url, params=params, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                print(f"第{retry_count+1}次尝试成功！")
-                return response.json()
-                
-            except Exception as retry_error:
-                print(f"第{retry_count+1}次尝试失败: {retry_error}")
-                
-                # 如果不是最后一次重试，等待一段时间
-                if retry_count < 3:
-                    wait_time = 2 ** retry_count  # 指数退避：2, 4秒
-                    print(f"等待{wait_time}秒后重试...")
-                    time.sleep(wait_time)
-        
         # 所有重试都失败
-        print("所有重试均失败")
+        print(f"请求失败: {e}")
         return None
 
+def fetch_szse_range(sec_code, start_date, end_date, session=None, bucket=None):
+    """
+    一次区间查询获取 [start_date, end_date] 内的全部数据，必要时翻页
+
+    返回 {日期(YYYY-MM-DD): 单日格式的返回数据}，任意一页失败时返回 None
+    bucket: 限流器，第2页起每次翻页前取一个令牌（第1页由调用方限流）
+    """
+    data = fetch_szse_data(sec_code=sec_code, date=start_date, session=session, end_date=end_date)
+    if not data:
+        return None if data is None else {}
+    
+    rows = list(data[0].get("data") or [])
+    page_count = int(data[0].get("metadata", {}).get("pagecount") or 1)
+    for page in range(2, page_count + 1):
+        if bucket is not None:
+            bucket.acquire()
+        page_data = fetch_szse_data(sec_code=sec_code, date=start_date, session=session,
+                                    end_date=end_date, page=page)
+        if page_data is None:
+            return None
+        if page_data:
+            rows.extend(page_data[0].get("data") or [])
+    
+    # 按交易日期拆分为单日格式，便于沿用 save_to_csv
+    days = {}
+    for row in rows:
+        days[row.get('jyrq', '')] = [{"metadata": data[0].get("metadata", {}), "data": [row]}]
+    return days
+
+# 任务状态文件
+JOB_STATE_FILE = "sz_jobs.json"
+
 def is_json_complete(data):
     """
     判断深圳证券交易所JSON数据是否完整
@@ -100,107 +124,99 @@ def is_json_complete(data):
     else:
         return "是"
 
-def save_to_csv(data, filename="szse_stock_data.csv"):
+def save_to_csv(data, filename="szse_stock_data.csv", writer=None, sec_code="", date=""):
     """
     将深圳证券交易所数据保存到CSV文件
+
+    writer: 批量写入器，传入时只缓存该行，由调用方统一写出
+    sec_code/date: 数据不完整时写入失败行的代码和日期，用于之后成功时覆盖该行
     """
-    # 判断数据完整性
-    completeness = is_json_complete(data)
-    
-    # 准备CSV行数据
-    if data and len(data) > 0 and data[0].get("data") and len(data[0]["data"]) > 0:
-        result = data[0]["data"][0]
-        row = [
-            result.get('zqjc', ''),
-            result.get('zqdm', ''),
-            result.get('jyrq', ''),
-            result.get('qss', ''),
-            result.get('ks', ''),
-            result.get('zg', ''),
-            result.get('zd', ''),
-            result.get('ss', ''),
-            result.get('sdf', ''),
-            result.get('cjgs', ''),
-            result.get('cjje', ''),
-            completeness
-        ]
+    # 统一为标准记录：数值和日期在这里解析一次
+    if is_json_complete(data) == "是":
+        bar = Bar.from_szse(data[0]["data"][0])
     else:
-        # 如果数据不完整，创建空行但仍包含完整性判断
-        row = ['', '', '', '', '', '', '', '', '', '', '', completeness]
+        # 如果数据不完整，写入只有代码和日期的失败行
+        bar = Bar.failed(sec_code, "SZ", date)
+    row = bar.to_row()
     
-    # 写入CSV文件
-    try:
-        # 尝试打开文件以检查是否存在
-        with open(filename, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            # 如果文件存在，则追加数据
-            with open(filename, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(row)
-    except FileNotFoundError:
-        # 如果文件不存在，创建文件并写入表头
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            # 写入表头
-            header = [
-                "证券名称", "证券代码", "交易日期", "前收价", "开盘价", 
-                "最高价", "最低价", "收盘价", "涨跌幅(%)", 
-                "成交量(万份)", "成交额(万元)", "数据完整性"
-            ]
-            writer.writerow(header)
-            writer.writerow(row)
-            
-    print(f"数据已保存到 {filename}")
+    # 写入CSV文件：未传入写入器时立即写出这一行
+    if writer is None:
+        with BatchCSVWriter() as single_writer:
+            single_writer.write(filename, CSV_HEADER, row)
+    else:
+        writer.write(filename, CSV_HEADER, row)
 
-def sz_fetch_and_save_data(codes, start_date, end_date):
+def sz_fetch_and_save_data(codes, start_date, end_date, max_workers=4, rate=2.0, range_mode=True,
+                           batch_size=500, skip_existing=True):
     """
     主函数：获取并保存数据
+
+    max_workers: 并发请求线程数
+    rate: 深圳接口限速（每秒请求数），替代原来每次请求后固定等待5秒
+    range_mode: 每个代码用一次区间查询（必要时翻页）获取整个日期范围，
+                而不是逐日请求；写入的行和成功/失败次数与逐日模式一致
+    batch_size: 每个CSV文件缓存多少行后写出一次
+    skip_existing: 跳过CSV中已有完整数据的日期；失败的日期会重新请求并覆盖原来的失败行
+
+    任务状态保存在 sz_jobs.json，之前中断或失败的任务会并入本次运行
     """
-    # 统计网络请求成功和失败次数
-    success_count = 0
-    fail_count = 0
+    # 只保留交易日，非交易日不发请求
+    dates = [d.strftime('%Y-%m-%d') for d in trading_days(start_date, end_date)]
+    bucket = get_bucket("szse", rate)
     
-    # 设定每天递增的间隔（一天）
-    delta = datetime.timedelta(days=1)
+    # 持久化任务队列：中断或失败的任务在下次运行时自动续跑
+    state = JobState(JOB_STATE_FILE)
     
-    for code in codes:
-        # 为每个代码创建CSV文件
-        csv_filename = f"{code}_SZ.csv"
+    # 同一次运行的所有行缓存在写入器中，结束时（或出错时）统一原子写出
+    with BatchCSVWriter(batch_size=batch_size) as writer:
+        def store_of(code):
+            # 为每个代码创建CSV文件
+            return writer.store(f"{code}_SZ.csv", CSV_HEADER)
+        
+        # 每个代码需要请求的日期；已有完整数据的日期跳过
+        missing = {}
+        for code, date_str in resume_jobs(state, codes, dates, store_of, skip_existing):
+            missing.setdefault(code, []).append(date_str)
         
-        # 循环遍历日期
-        current_date = start_date
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            print(f"正在获取代码 {code} 日期 {date_str} 的数据...")
+        def save_day(code, date_str, data):
+            save_to_csv(data, f"{code}_SZ.csv", writer=writer, sec_code=code, date=date_str)
+            state.mark(code, date_str, is_json_complete(data) == "是")
+        
+        if not range_mode:
+            # 逐日模式：生成全部 (代码, 日期) 任务
+            jobs = [(code, date_str) for code in missing for date_str in missing[code]]
             
-            # 获取数据
-            try:
-                data = fetch_szse_data(sec_code=code, date=date_str)
-                
-                # 如果fetch_szse_data返回None，表示请求失败
-                if data is None:
-                    # 保存空数据到CSV
-                    save_to_csv(None, csv_filename)
-                    fail_count += 1
-                    print(f"代码 {code} 日期 {date_str} 请求失败")
-                else:
-                    # 保存数据到CSV
-                    save_to_csv(data, csv_filename)
-                    success_count += 1
-                    print(f"代码 {code} 日期 {date_str} 请求成功")
-                    
-            except Exception as e:
-                # 如果fetch_szse_data抛出异常，表示请求失败
-                print(f"代码 {code} 日期 {date_str} 请求异常: {e}")
-                # 保存空数据到CSV
-                save_to_csv(None, csv_filename)
-                fail_count += 1
+            def fetch(code, date_str):
+                return fetch_szse_data(sec_code=code, date=date_str)
             
-            # 将当前日期增加一天
-            current_date += delta
+            # 并发获取，统计网络请求成功和失败次数
+            success_count, fail_count = run_jobs(jobs, fetch, save_day, bucket,
+                                                 max_workers=max_workers)
+        else:
+            # 区间模式：每个代码一个任务，区间覆盖该代码所有缺失日期
+            jobs = [(code, f"{missing[code][0]}~{missing[code][-1]}") for code in missing]
+            counts = [0, 0]
             
-            # 单线程调用间隔5秒
-            time.sleep(5)
+            def fetch(code, date_range):
+                return fetch_szse_range(code, missing[code][0], missing[code][-1], bucket=bucket)
+            
+            def save(code, date_range, days):
+                # 按日拆分写入，区间内没有数据的日期写入不完整行
+                for date_str in missing[code]:
+                    data = None if days is None else days.get(date_str, [{"data": []}])
+                    save_day(code, date_str, data)
+                    counts[0 if data is not None else 1] += 1
+            
+            run_jobs(jobs, fetch, save, bucket, max_workers=max_workers)
+            success_count, fail_count = counts
+
+    # 与CSV一起更新列式存储
+    for filename in sorted(writer.flushed):
+        build_from_csv(filename)
+    
+    # CSV写出后再保存任务状态，只保留失败的任务留待下次重试
+    state.prune()
+    state.save()
 
     # 最终统计结果
     print(f"深圳所有任务完成！成功次数: {success_count}, 失败次数: {fail_count}")
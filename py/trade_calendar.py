@@ -0,0 +1,151 @@
+import bisect
+import datetime
+import os
+import threading
+from array import array
+
+# 交易日历缓存文件：int32 数组，开头为 [FILE_MARK, 下载日期]，之后按升序存放 YYYYMMDD 形式的交易日
+CALENDAR_FILE = "trade_calendar.bin"
+
+# 文件头标记（旧格式文件没有文件头，下载日期未知）
+FILE_MARK = -1
+
+# 缓存超过该天数后重新下载
+REFRESH_DAYS = 30
+
+_calendar = None
+_download_tried = False
+# 抓取阶段在多个线程中并行执行，日历的加载和下载只能由一个线程完成
+_calendar_lock = threading.Lock()
+
+
+def _to_int(date):
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def _to_date(value):
+    return datetime.date(value // 10000, value // 100 % 100, value % 100)
+
+
+def download_calendar():
+    """
+    通过 akshare 获取全部历史交易日（数据来自新浪），返回升序 int32 数组
+    """
+    import akshare as ak
+    trade_cal_df = ak.tool_trade_date_hist_sina()
+    days = sorted(_to_int(d) for d in trade_cal_df["trade_date"].map(
+        lambda v: v if isinstance(v, datetime.date) else datetime.date.fromisoformat(str(v)[:10])))
+    return array('i', days)
+
+
+def save_calendar(days, filename=CALENDAR_FILE, fetched=None):
+    """
+    原子写入日历缓存文件，文件头中记录下载日期（默认今天）
+
+    下载日期写在文件内容中，而不是依赖文件修改时间（git 检出会重置修改时间）
+    """
+    fetched = fetched or datetime.date.today()
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'wb') as f:
+        array('i', [FILE_MARK, _to_int(fetched)]).tofile(f)
+        days.tofile(f)
+    os.replace(tmp, filename)
+
+
+def load_calendar_info(filename=CALENDAR_FILE):
+    """
+    读取日历缓存文件，返回 (交易日数组, 下载日期)；文件不存在时返回 (None, None)，
+    旧格式文件的下载日期为 None
+    """
+    try:
+        with open(filename, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None, None
+    days = array('i')
+    days.frombytes(raw)
+    if len(days) >= 2 and days[0] == FILE_MARK:
+        return days[2:], _to_date(days[1])
+    return days, None
+
+
+def load_calendar(filename=CALENDAR_FILE):
+    """
+    读取日历缓存文件中的交易日，不存在时返回 None
+    """
+    return load_calendar_info(filename)[0]
+
+
+class TradeCalendar:
+    """
+    交易日历：集合用于 O(1) 判断，升序数组用于区间查询
+    """
+
+    def __init__(self, days):
+        self.days = days
+        self.day_set = set(days)
+        self.last = days[-1] if days else 0
+
+    def is_trading_day(self, date):
+        value = _to_int(date)
+        if value > self.last:
+            # 超出日历范围时退化为只排除周末
+            return date.weekday() < 5
+        return value in self.day_set
+
+    def trading_days(self, start_date, end_date):
+        """
+        返回 [start_date, end_date] 内的交易日列表
+        """
+        start, end = _to_int(start_date), _to_int(end_date)
+        lo = bisect.bisect_left(self.days, start)
+        hi = bisect.bisect_right(self.days, end)
+        result = [_to_date(v) for v in self.days[lo:hi]]
+
+        # 日历尚未覆盖的日期按工作日处理
+        current_date = start_date
+        if self.last:
+            current_date = max(start_date, _to_date(self.last) + datetime.timedelta(days=1))
+        while current_date <= end_date:
+            if current_date.weekday() < 5:
+                result.append(current_date)
+            current_date += datetime.timedelta(days=1)
+        return result
+
+
+def get_calendar(end_date=None, filename=CALENDAR_FILE):
+    """
+    获取交易日历：优先使用本地缓存，缓存过期或未覆盖 end_date 时尝试重新下载
+
+    线程安全：其他线程等待正在进行的下载完成，而不是拿到空日历
+    """
+    global _calendar, _download_tried
+    with _calendar_lock:
+        if _calendar is not None and (end_date is None or _download_tried
+                                      or _to_int(end_date) <= _calendar.last):
+            return _calendar
+
+        days, fetched = load_calendar_info(filename)
+        age_days = (datetime.date.today() - fetched).days if fetched else None
+
+        # 缓存缺失、下载日期未知或过期、或未覆盖 end_date 时重新下载（每个进程最多一次）
+        stale = (days is None or age_days is None or age_days > REFRESH_DAYS
+                 or (end_date is not None and _to_int(end_date) > (days[-1] if days else 0)))
+        if stale and not _download_tried:
+            _download_tried = True
+            try:
+                days = download_calendar()
+                save_calendar(days, filename)
+                print(f"交易日历已更新，共 {len(days)} 个交易日")
+            except Exception as e:
+                print(f"交易日历更新失败，使用{'本地缓存' if days else '工作日'}代替: {e}")
+
+        _calendar = TradeCalendar(days if days is not None else array('i'))
+        return _calendar
+
+
+def trading_days(start_date, end_date):
+    """
+    返回 [start_date, end_date] 内的交易日列表（在任何网络请求之前过滤掉非交易日）
+    """
+    return get_calendar(end_date).trading_days(start_date, end_date)